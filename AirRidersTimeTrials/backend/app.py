@@ -1,9 +1,11 @@
+import hashlib
 import os
 import re
-from flask import Flask, app, send_from_directory
+import click
+from flask import Flask, send_from_directory
 from flask_cors import CORS
 
-from config import Config
+from config import Config, normalize_database_url
 from extensions import db, ma, jwt
 
 
@@ -12,9 +14,39 @@ from routes_countries import bp_countries, load_countries_from_json
 from routes_auth import bp_auth
 from routes_courses import bp_courses
 from routes_records import bp_records
+from routes_stats import bp_stats
+from routes_players import bp_players
+from routes_stream import bp_stream
 
-from models import Course, Machine, Character
+from models import Course, Machine, Character, Record, AppMeta
 from seed import run_seed
+import datagen
+from wr_index import ensure_wr_tables, rebuild_current_wrs, rebuild_wr_reigns, rebuild_personal_bests
+from migrations import run_migrations, current_version
+from instrumentation import init_instrumentation
+from json_provider import init_json
+from fragments import init_fragments
+from leaderboard import init_leaderboards
+from compression import init_compression, compress_static_folder
+from assets import init_assets, build_assets
+from db_tuning import init_db_tuning
+from db_routing import configure_read_engine, init_read_routing
+from metrics import init_metrics, bp_metrics
+from cache import init_cache, bump_data_version, bump_display_epoch
+
+
+# ---------- course list ----------
+AIR_RIDE_COURSES = [
+    "Floria Fields", "Waveflow Waters", "Airtopia Ruins", "Crystalline Fissure",
+    "Steamgust Forge", "Cavernous Corners", "Cyberion Highway", "Mount Amberfalls",
+    "Galactic Nova", "Fantasy Meadows", "Celestial Valley", "Sky Sands",
+    "Frozen Hillside", "Magma Flows", "Beanstalk Park", "Machine Passage",
+    "Checker Knights", "Nebula Belt"
+]
+
+TOP_RIDE_COURSES = [
+    "Flower", "Flow", "Air", "Crystal", "Steam", "Cave", "Cyber", "Mountain", "Nova"
+]
 
 
 # ---------- helpers for auto-seeding ----------
@@ -72,18 +104,6 @@ def seed_all_courses():
     Also tries to find a matching map icon file in static/images/mapICONS/
     by checking common filename variants.
     """
-    air_ride_courses = [
-        "Floria Fields", "Waveflow Waters", "Airtopia Ruins", "Crystalline Fissure",
-        "Steamgust Forge", "Cavernous Corners", "Cyberion Highway", "Mount Amberfalls",
-        "Galactic Nova", "Fantasy Meadows", "Celestial Valley", "Sky Sands",
-        "Frozen Hillside", "Magma Flows", "Beanstalk Park", "Machine Passage",
-        "Checker Knights", "Nebula Belt"
-    ]
-
-    top_ride_courses = [
-        "Flower", "Flow", "Air", "Crystal", "Steam", "Cave", "Cyber", "Mountain", "Nova"
-    ]
-
     map_folder = static_images_dir("mapICONS")
     map_files = set(list_image_files(map_folder))
 
@@ -103,10 +123,13 @@ def seed_all_courses():
                 return f"images/mapICONS/{c}"
         return None
 
+    # one query for everything already in the DB instead of one per course
+    existing_by_key = {c.course_key: c for c in Course.query.all()}
+
     # insert if missing
-    for name in air_ride_courses:
+    for name in AIR_RIDE_COURSES:
         key = slugify_course_key(name)
-        existing = Course.query.filter_by(course_key=key).first()
+        existing = existing_by_key.get(key)
         if not existing:
             db.session.add(Course(
                 course_key=key,
@@ -120,10 +143,10 @@ def seed_all_courses():
                 if icon:
                     existing.map_icon = icon
 
-    for name in top_ride_courses:
+    for name in TOP_RIDE_COURSES:
         display_name = f"{name} (Top Ride)"
         key = slugify_course_key(name)  # user asked "flower", "flow", etc. keep keys simple
-        existing = Course.query.filter_by(course_key=key).first()
+        existing = existing_by_key.get(key)
         if not existing:
             db.session.add(Course(
                 course_key=key,
@@ -144,11 +167,12 @@ def seed_all_characters_from_icons():
     Seeds characters from whatever is inside static/images/charICONS/
     """
     folder = static_images_dir("charICONS")
+    existing_by_name = {c.name: c for c in Character.query.all()}
     for fname in list_image_files(folder):
         name = prettify_name_from_filename(fname)
         rel_icon = f"images/charICONS/{fname}"
 
-        existing = Character.query.filter_by(name=name).first()
+        existing = existing_by_name.get(name)
         if not existing:
             db.session.add(Character(name=name, icon=rel_icon))
         else:
@@ -163,11 +187,12 @@ def seed_all_machines_from_icons():
     Seeds machines from whatever is inside static/images/machineICONS/
     """
     folder = static_images_dir("machineICONS")
+    existing_by_name = {m.name: m for m in Machine.query.all()}
     for fname in list_image_files(folder):
         name = prettify_name_from_filename(fname)
         rel_icon = f"images/machineICONS/{fname}"
 
-        existing = Machine.query.filter_by(name=name).first()
+        existing = existing_by_name.get(name)
         if not existing:
             db.session.add(Machine(name=name, icon=rel_icon))
         else:
@@ -176,19 +201,124 @@ def seed_all_machines_from_icons():
     db.session.commit()
 
 
-def create_app():
+def catalog_fingerprint() -> str:
+    """
+    Hash of everything the catalog seed reads: the course list, the icon
+    folders' file names and countries.json. Same hash -> seeding would be a no-op.
+    """
+    h = hashlib.sha256()
+    h.update("|".join(AIR_RIDE_COURSES + TOP_RIDE_COURSES).encode("utf-8"))
+    for folder in ("mapICONS", "charICONS", "machineICONS"):
+        h.update(f"\n{folder}:".encode("utf-8"))
+        h.update("|".join(list_image_files(static_images_dir(folder))).encode("utf-8"))
+
+    countries_json = static_images_dir("country-flags-main", "countries.json")
+    if os.path.exists(countries_json):
+        with open(countries_json, "rb") as f:
+            h.update(f.read())
+
+    return h.hexdigest()
+
+
+def seed_catalog(force: bool = False) -> bool:
+    """
+    Countries, courses, characters and machines.
+    Skipped when the fingerprint stored in app_meta matches the files on disk.
+    Returns True if it actually seeded.
+    """
+    fingerprint = catalog_fingerprint()
+    meta = db.session.get(AppMeta, "catalog_fingerprint")
+    if not force and meta is not None and meta.value == fingerprint:
+        print("Catalog unchanged, seeding skipped.")
+        return False
+
+    # Countries from countries.json → DB (once)
+    load_countries_from_json()
+
+    # Auto seed EVERYTHING from static folders + course list
+    seed_all_courses()
+    seed_all_characters_from_icons()
+    seed_all_machines_from_icons()
+
+    if meta is None:
+        meta = AppMeta(key="catalog_fingerprint")
+        db.session.add(meta)
+    meta.value = fingerprint
+    bump_data_version()  # icon paths show up in API rows (cached row fragments key on them, see fragments.py)
+    bump_display_epoch()
+    db.session.commit()
+    print("Catalog seeded.")
+    return True
+
+
+def init_db(demo_data: bool = False, force_seed: bool = False):
+    """
+    One-shot database setup, run once per deploy (flask init-db), not per worker:
+    tables, migrations, catalog seed (if assets changed), optional demo data,
+    and the derived WR tables.
+    """
+    # primary only: the readonly bind has no tables of its own (and Flask-SQLAlchemy keeps a
+    # metadata for it process-wide once any app had it, e.g. bench parity's SQLite twin)
+    db.create_all(bind_key=None)
+
+    # upgrade existing air_riders.db files in place (indexes etc.)
+    run_migrations()
+
+    seed_catalog(force=force_seed)
+
+    if demo_data:
+        run_seed()
+
+    # current_wrs / wr_reigns are derived from records; fill them for older databases
+    ensure_wr_tables()
+
+
+def check_unique_routes(app):
+    """
+    Fails startup if two view functions are registered for the same URL + method.
+    Flask would silently serve whichever blueprint was registered first.
+    """
+    seen = {}
+    dupes = []
+    for rule in app.url_map.iter_rules():
+        for method in rule.methods - {"HEAD", "OPTIONS"}:
+            key = (rule.rule, method)
+            if key in seen:
+                dupes.append(f"{method} {rule.rule}: {seen[key]} and {rule.endpoint}")
+            else:
+                seen[key] = rule.endpoint
+    if dupes:
+        raise RuntimeError("Duplicate URL rules:\n  " + "\n  ".join(dupes))
+
+
+def create_app(overrides=None):
+    """overrides: optional dict applied on top of Config (the benchmark uses it to point at its own DB)."""
     app = Flask(__name__, static_folder="../static", static_url_path="/static")
     app.config.from_object(Config)
-    CORS(app)
+    if overrides:
+        app.config.update(overrides)
+        app.config["SQLALCHEMY_DATABASE_URI"] = normalize_database_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    # ETag must be readable by fetchJSON() when the page is on another origin
+    CORS(app, expose_headers=["ETag", "X-SQL-Queries", "Server-Timing"])
 
+    configure_read_engine(app)
     db.init_app(app)
+    init_db_tuning(app)
+    init_read_routing(app)
     ma.init_app(app)
     jwt.init_app(app)
-
-    from routes_stats import bp_stats
-
-
-    # Blueprints
+    init_instrumentation(app)
+    # before anything whose before_request can answer early (compression serves static .gz/.br),
+    # so every request that counts as in flight also gets counted out
+    init_metrics(app)
+    init_json(app)
+    init_cache(app)
+    init_fragments(app)
+    init_leaderboards(app)
+    init_compression(app)
+    init_assets(app)
+
+    # Blueprints (one blueprint per URL; check_unique_routes enforces it)
 
     app.register_blueprint(bp_stats)
     app.register_blueprint(bp_home)
@@ -196,30 +326,95 @@ def create_app():
     app.register_blueprint(bp_auth)
     app.register_blueprint(bp_courses)
     app.register_blueprint(bp_records)
+    app.register_blueprint(bp_players)
+    app.register_blueprint(bp_stream)
+    app.register_blueprint(bp_metrics)
 
     # Serve uploaded proof files
     @app.get("/uploads/<path:filename>")
     def serve_uploads(filename):
         return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
 
-    with app.app_context():
-        db.create_all()
+    check_unique_routes(app)
 
-        # Countries from countries.json → DB (once)
-        load_countries_from_json()
+    # NOTE: no database work here. Workers just build the app; the database
+    # is prepared once with `flask --app backend/app.py init-db`.
 
-        # Auto seed EVERYTHING from static folders + course list
-        seed_all_courses()
-        seed_all_characters_from_icons()
-        seed_all_machines_from_icons()
+    # flask --app backend/app.py init-db
+    @app.cli.command("init-db")
+    @click.option("--force-seed", is_flag=True, help="Re-seed the catalog even if nothing changed.")
+    def init_db_command(force_seed):
+        """Create tables, run migrations and seed the catalog (if assets changed)."""
+        init_db(force_seed=force_seed)
+        print("Database ready.")
 
-        
+    # flask --app backend/app.py seed
+    @app.cli.command("seed")
+    def seed_command():
+        """Add the demo users/records (only if there are no records yet)."""
         run_seed()
+        ensure_wr_tables()
+
+    # flask --app backend/app.py datagen --users 100000 --records 1000000
+    @app.cli.command("datagen")
+    @click.option("--users", default=datagen.DEFAULT_USERS, show_default=True, help="Users to create.")
+    @click.option("--records", default=datagen.DEFAULT_RECORDS, show_default=True, help="Records to create.")
+    @click.option("--seed", default=42, show_default=True, help="RNG seed; same seed -> same data.")
+    @click.option("--days", default=datagen.DEFAULT_DAYS, show_default=True, help="Days of history to spread records over.")
+    @click.option("--wipe", is_flag=True, help="Delete existing users/records first.")
+    def datagen_command(users, records, seed, days, wipe):
+        """Bulk-generate a large deterministic dataset for load testing."""
+        if wipe:
+            datagen.wipe_generated_data()
+        elif Record.query.first() is not None:
+            raise click.ClickException("Records already exist; pass --wipe to replace them.")
+        datagen.generate(users=users, records=records, seed=seed, days=days)
+
+    # flask --app backend/app.py rebuild-wrs
+    @app.cli.command("rebuild-wrs")
+    def rebuild_wrs_command():
+        """Recompute the current_wrs, wr_reigns and personal_bests tables from the records table."""
+        count = rebuild_current_wrs()
+        reigns = rebuild_wr_reigns()
+        pbs = rebuild_personal_bests()
+        bump_data_version()
+        bump_display_epoch()
+        db.session.commit()
+        print(f"Rebuilt current_wrs: {count} WRs, wr_reigns: {reigns} reigns, personal_bests: {pbs} rows.")
+
+    # flask --app backend/app.py build-assets
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """Write content-hashed copies of the static files + the flag sprite to static/dist/."""
+        manifest = build_assets(app.static_folder)
+        files = sum(1 for v in manifest.values() if isinstance(v, str))
+        print(f"Fingerprinted files: {files} (static/dist/manifest.json). Restart the app to use them.")
+
+    # flask --app backend/app.py compress-static
+    @app.cli.command("compress-static")
+    def compress_static_command():
+        """Write .gz (and .br, with brotli installed) next to the static css/js/svg files."""
+        counts = compress_static_folder(
+            app.static_folder,
+            app.config.get("COMPRESS_MIN_SIZE", 1024),
+            app.config.get("COMPRESS_STATIC_EXTENSIONS", set()),
+        )
+        print(f"Precompressed files written: {counts['written']}, already up to date: {counts['fresh']}, "
+              f"not worth compressing: {counts['skipped']}.")
+
+    # flask --app backend/app.py db-upgrade
+    @app.cli.command("db-upgrade")
+    def db_upgrade_command():
+        """Apply any pending schema migrations."""
+        applied = run_migrations()
+        print(f"Schema at version {current_version()} ({applied} migration(s) applied).")
 
     return app
 
 
-app = create_app()
-
 if __name__ == "__main__":
+    # local dev: set up the DB (with demo data) and run the dev server
+    app = create_app({"SQL_COUNT_HEADER": os.environ.get("SQL_COUNT_HEADER", "1") == "1"})
+    with app.app_context():
+        init_db(demo_data=True)
     app.run(debug=True, port=5000)
@@ -0,0 +1,175 @@
+"""
+Content-hashed static assets.
+
+`flask build-assets` copies every css/js/image file under static/ to
+static/dist/ with a hash of its contents in the name
+(images/charICONS/Kirby.png -> dist/images/charICONS/Kirby.3f2a9c1d0b.png)
+and writes static/dist/manifest.json mapping the original paths to the
+copies. When the manifest exists, static_path() (icon paths stored in the
+DB), the template's asset() and the page's flag URLs all point at the
+hashed copies, which are served with a one-year immutable Cache-Control:
+a changed file gets a new name, so browsers never have to revalidate.
+
+It also writes one SVG sprite with every flag as a <symbol>, so a table
+full of nations costs one request instead of one per flag.
+Without a manifest everything falls back to the plain static/ paths.
+"""
+import hashlib
+import json
+import os
+import re
+
+from flask import request
+
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+FLAG_DIR = "images/country-flags-main/svg"
+FINGERPRINT_EXTENSIONS = {"css", "js", "png", "jpg", "jpeg", "gif", "webp", "svg"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# original path relative to static/ -> hashed path relative to static/ (+ "flags-sprite", "flag-viewboxes")
+_manifest = {}
+
+
+# -------------------- BUILD --------------------
+def _hashed_name(relpath: str, data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    root, ext = os.path.splitext(relpath)
+    return f"{DIST_DIR}/{root}.{digest}{ext}"
+
+
+def _write(static_folder: str, relpath: str, data: bytes):
+    path = os.path.join(static_folder, relpath)
+    if os.path.exists(path):
+        return  # same name = same content
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+_SVG_ROOT = re.compile(r"<svg\b([^>]*)>(.*)</svg>", re.S)
+_VIEWBOX = re.compile(r'viewBox="([^"]+)"')
+
+def _flag_symbol(code: str, svg: str):
+    """(<symbol> markup, viewBox) for one flag; ids are prefixed so flags can't clash inside the sprite."""
+    m = _SVG_ROOT.search(svg)
+    if not m:
+        return None, None
+    attrs, body = m.groups()
+    viewbox = _VIEWBOX.search(attrs)
+    viewbox = viewbox.group(1) if viewbox else "0 0 640 480"
+
+    body = re.sub(r'\bid="([^"]+)"', rf'id="{code}-\1"', body)
+    body = re.sub(r"url\(#([^)]+)\)", rf"url(#{code}-\1)", body)
+    body = re.sub(r'href="#([^"]+)"', rf'href="#{code}-\1"', body)
+    return f'<symbol id="flag-{code}" viewBox="{viewbox}">{body}</symbol>', viewbox
+
+
+def build_flag_sprite(static_folder: str):
+    """(sprite bytes, {code: viewBox}) for every flag svg."""
+    folder = os.path.join(static_folder, FLAG_DIR)
+    symbols, viewboxes = [], {}
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(".svg"):
+            continue
+        code = name[:-4].lower()
+        with open(os.path.join(folder, name), encoding="utf-8") as f:
+            symbol, viewbox = _flag_symbol(code, f.read())
+        if symbol:
+            symbols.append(symbol)
+            viewboxes[code] = viewbox
+    sprite = (
+        '<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" style="display:none">'
+        + "".join(symbols) + "</svg>"
+    )
+    return sprite.encode("utf-8"), viewboxes
+
+
+def build_assets(static_folder: str) -> dict:
+    """
+    Writes the hashed copies, the flag sprite and the manifest. Copies from
+    earlier builds are kept so pages still open in a browser keep working.
+    Returns the manifest.
+    """
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.relpath(root, static_folder) == ".":
+            dirs[:] = [d for d in dirs if d != DIST_DIR]
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower().lstrip(".") not in FINGERPRINT_EXTENSIONS:
+                continue
+            relpath = os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, "/")
+            with open(os.path.join(root, name), "rb") as f:
+                data = f.read()
+            hashed = _hashed_name(relpath, data)
+            _write(static_folder, hashed, data)
+            manifest[relpath] = hashed
+
+    if os.path.isdir(os.path.join(static_folder, FLAG_DIR)):
+        sprite, viewboxes = build_flag_sprite(static_folder)
+        hashed = _hashed_name("images/flags-sprite.svg", sprite)
+        _write(static_folder, hashed, sprite)
+        manifest["flags-sprite"] = hashed
+        manifest["flag-viewboxes"] = viewboxes
+
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+    return manifest
+
+
+# -------------------- LOOKUPS --------------------
+def asset_url(path: str) -> str:
+    """"images/x.png" or "static/images/x.png" -> "static/dist/images/x.<hash>.png" (or "static/images/x.png")."""
+    path = path.replace("\\", "/").lstrip("/")
+    if path.startswith("static/"):
+        path = path[len("static/"):]
+    return f"static/{_manifest.get(path, path)}"
+
+
+def asset_config(app) -> dict:
+    """What the page needs to build flag URLs on its own (embedded in index.html)."""
+    if not _manifest:
+        return {}
+    if app.config.get("ASSETS_FLAG_SPRITE", False) and "flags-sprite" in _manifest:
+        return {
+            "flagSprite": f"static/{_manifest['flags-sprite']}",
+            "flagViewBoxes": _manifest.get("flag-viewboxes", {}),
+        }
+    prefix = FLAG_DIR + "/"
+    return {
+        "flags": {
+            rel[len(prefix):-4].lower(): f"static/{hashed}"
+            for rel, hashed in _manifest.items()
+            if isinstance(hashed, str) and rel.startswith(prefix) and rel.endswith(".svg")
+        },
+    }
+
+
+# -------------------- FLASK WIRING --------------------
+def init_assets(app):
+    """Loads the manifest (if `flask build-assets` was run) and marks the hashed files immutable."""
+    from stats_service import static_path
+
+    _manifest.clear()
+    path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+    if app.config.get("ASSETS_FINGERPRINT", True) and os.path.isfile(path):
+        with open(path, encoding="utf-8") as f:
+            _manifest.update(json.load(f))
+    static_path.cache_clear()  # it memoizes resolved paths
+
+    app.jinja_env.globals["asset"] = asset_url
+
+    @app.context_processor
+    def asset_context():
+        return {"asset_config": asset_config(app)}
+
+    @app.after_request
+    def immutable_assets(response):
+        filename = (request.view_args or {}).get("filename", "")
+        if request.endpoint == "static" and filename.startswith(DIST_DIR + "/") and response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE
+        return response
+
@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import current_app, g, request
+from sqlalchemy import update
+
+from extensions import db
+from models import DataVersion, AppMeta
+
+
+# -------------------- DATA VERSION --------------------
+def data_version() -> int:
+    """Current value of the global data-version counter (one tiny indexed read)."""
+    return db.session.query(DataVersion.version).filter_by(id=1).scalar() or 0
+
+def bump_data_version():
+    """
+    Call from every write path that changes stats output (new record, user
+    country change, user created/deleted), inside the same transaction, before commit.
+    Every cached stats response keyed on the old version becomes unreachable.
+    """
+    result = db.session.execute(
+        update(DataVersion).where(DataVersion.id == 1).values(version=DataVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.session.add(DataVersion(id=1, version=1))
+
+
+def _meta_counter(key: str) -> int:
+    meta = db.session.get(AppMeta, key)
+    return int(meta.value) if meta is not None and meta.value else 0
+
+def _bump_meta_counter(key: str):
+    meta = db.session.get(AppMeta, key)
+    if meta is None:
+        db.session.add(AppMeta(key=key, value="1"))
+    else:
+        meta.value = str(int(meta.value or 0) + 1)
+
+
+def deletion_epoch() -> int:
+    """
+    Bumped whenever records disappear (account deletes, datagen --wipe). In-process
+    structures that only ever apply new records (leaderboard.py) reload when it changes.
+    """
+    return _meta_counter("deletion_epoch")
+
+def bump_deletion_epoch():
+    _bump_meta_counter("deletion_epoch")
+
+
+def display_epoch() -> int:
+    """
+    Bumped when rows already shown on the page change without a new record: a player's
+    country, a catalog reseed, a WR rebuild. Unlike the data version it doesn't move on
+    sign-ups, so the live feed (events.py) only asks pages to refetch when it matters.
+    """
+    return _meta_counter("display_epoch")
+
+def bump_display_epoch():
+    _bump_meta_counter("display_epoch")
+
+
+# -------------------- RESPONSE CACHE --------------------
+class ResponseCache:
+    """Small thread-safe LRU with a TTL. Values are (body bytes, status, mimetype)."""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: int = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def init_cache(app):
+    app.extensions["response_cache"] = ResponseCache(
+        max_entries=app.config.get("RESPONSE_CACHE_SIZE", 256),
+        ttl_seconds=app.config.get("RESPONSE_CACHE_TTL", 300),
+    )
+
+def response_cache() -> ResponseCache:
+    return current_app.extensions["response_cache"]
+
+
+def _cache_key(version: int):
+    """
+    endpoint + view args + query args + data version + today's date.
+    The date is part of the key because "days held" values change at midnight
+    even when no data does.
+    """
+    return (
+        request.endpoint,
+        tuple(sorted((request.view_args or {}).items())),
+        tuple(sorted(request.args.items(multi=True))),
+        version,
+        date.today().isoformat(),
+    )
+
+
+def _etag_for(key) -> str:
+    """Strong ETag: same endpoint/args/data version/day -> same bytes."""
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:32]
+
+
+def cached_response(view):
+    """
+    Caches a JSON view's successful response body in memory and answers
+    conditional GETs: the ETag is derived from the same key as the cache, so a
+    matching If-None-Match gets a 304 without running the view at all.
+    Use under the route decorator:
+        @bp.get("/api/...")
+        @cached_response
+        def view(): ...
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = _cache_key(data_version())
+        etag = _etag_for(key)
+
+        # weak match: compression.py turns the ETag weak when it gzips the body
+        if request.if_none_match.contains_weak(etag):
+            g.cache_status = "not-modified"
+            resp = current_app.response_class(status=304)
+            resp.set_etag(etag)
+            resp.headers["Cache-Control"] = "no-cache"
+            return resp
+
+        cache = response_cache()
+        use_cache = current_app.config.get("RESPONSE_CACHE_ENABLED", True)
+        hit = cache.get(key) if use_cache else None
+        g.cache_status = "hit" if hit is not None else "miss"
+        if hit is not None:
+            body, status, mimetype = hit
+            resp = current_app.response_class(body, status=status, mimetype=mimetype)
+        else:
+            resp = current_app.make_response(view(*args, **kwargs))
+            if use_cache and resp.status_code == 200 and not resp.is_streamed:
+                cache.set(key, (resp.get_data(), resp.status_code, resp.mimetype))
+
+        if resp.status_code == 200:
+            resp.set_etag(etag)
+            # let browsers keep the body but always revalidate with us
+            resp.headers["Cache-Control"] = "no-cache"
+        return resp
+
+    return wrapper
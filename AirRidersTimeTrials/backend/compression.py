@@ -0,0 +1,166 @@
+"""
+gzip / brotli response compression.
+
+Dynamic responses (JSON, the HTML page, /metrics) above COMPRESS_MIN_SIZE are
+compressed per request with the best encoding the client accepts; bodies
+that carry an ETag (the cached endpoints) are compressed once per encoding
+and reused. Streamed responses (the SSE feed, files) are never touched.
+
+Static files are not compressed on the fly: `flask compress-static` writes
+.gz / .br siblings once, and requests for the original are answered with the
+matching sibling when it is up to date.
+
+brotli is optional (pip install brotli); without it only gzip is offered.
+"""
+import gzip
+import mimetypes
+import os
+
+from flask import request, send_file
+
+from cache import ResponseCache
+from instrumentation import timed
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+# suffix of the precompressed sibling per encoding, best first
+STATIC_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accepted(encoding: str) -> bool:
+    return request.accept_encodings[encoding] > 0
+
+def pick_encoding():
+    if brotli is not None and _accepted("br"):
+        return "br"
+    if _accepted("gzip"):
+        return "gzip"
+    return None
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        # brotli quality runs 0-11; map the gzip-style 1-9 level onto it
+        return brotli.compress(data, quality=min(11, max(0, round(level * 11 / 9))))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+# -------------------- PRECOMPRESSED STATIC FILES --------------------
+def precompressed_sibling(path: str):
+    """(encoding, sibling path) of a fresh .br/.gz next to `path` the client accepts, or None."""
+    for encoding, suffix in STATIC_ENCODINGS:
+        sibling = path + suffix
+        if not _accepted(encoding) or not os.path.isfile(sibling):
+            continue
+        if os.path.getmtime(sibling) >= os.path.getmtime(path):
+            return encoding, sibling
+    return None
+
+
+def compress_static_folder(folder: str, min_size: int, extensions) -> dict:
+    """
+    Writes <file>.gz (and <file>.br with brotli installed) for every file in
+    `folder` with one of `extensions` and at least `min_size` bytes. Up-to-date
+    siblings are left alone; a sibling that isn't smaller than the original is
+    not kept. Returns counts.
+    """
+    counts = {"written": 0, "fresh": 0, "skipped": 0}
+    for root, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            ext = os.path.splitext(name)[1].lower().lstrip(".")
+            if ext not in extensions or os.path.getsize(path) < min_size:
+                continue
+
+            with open(path, "rb") as f:
+                data = None
+                for encoding, suffix in STATIC_ENCODINGS:
+                    if encoding == "br" and brotli is None:
+                        continue
+                    sibling = path + suffix
+                    if os.path.isfile(sibling) and os.path.getmtime(sibling) >= os.path.getmtime(path):
+                        counts["fresh"] += 1
+                        continue
+                    if data is None:
+                        data = f.read()
+                    body = brotli.compress(data, quality=11) if encoding == "br" else gzip.compress(data, 9, mtime=0)
+                    if len(body) >= len(data):
+                        counts["skipped"] += 1
+                        if os.path.isfile(sibling):
+                            os.remove(sibling)
+                        continue
+                    with open(sibling, "wb") as out:
+                        out.write(body)
+                    counts["written"] += 1
+    return counts
+
+
+# -------------------- FLASK WIRING --------------------
+def init_compression(app):
+    """Register after init_instrumentation so the time spent shows up as "compress" in Server-Timing."""
+    if not app.config.get("COMPRESS_ENABLED", True):
+        return
+
+    min_size = app.config.get("COMPRESS_MIN_SIZE", 1024)
+    level = app.config.get("COMPRESS_LEVEL", 6)
+    mimetypes_ok = set(app.config.get("COMPRESS_MIMETYPES", ()))
+    # compressed bodies of ETagged responses: (etag, encoding) -> bytes
+    compressed_cache = ResponseCache(max_entries=app.config.get("COMPRESS_CACHE_SIZE", 128), ttl_seconds=3600)
+
+    if app.config.get("COMPRESS_STATIC_PRECOMPRESSED", True):
+        @app.before_request
+        def serve_precompressed_static():
+            if request.endpoint != "static" or request.method not in ("GET", "HEAD"):
+                return None
+            filename = (request.view_args or {}).get("filename", "")
+            path = os.path.realpath(os.path.join(app.static_folder, filename))
+            if not path.startswith(os.path.realpath(app.static_folder) + os.sep) or not os.path.isfile(path):
+                return None  # let the normal static view answer (404s etc.)
+
+            found = precompressed_sibling(path)
+            if found is None:
+                return None
+            encoding, sibling = found
+            mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            resp = send_file(sibling, mimetype=mimetype, conditional=True, max_age=app.get_send_file_max_age(filename))
+            resp.headers["Content-Encoding"] = encoding
+            resp.vary.add("Accept-Encoding")
+            return resp
+
+    @app.after_request
+    def compress_response(response):
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code != 200
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in mimetypes_ok
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        encoding = pick_encoding()
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        cache_key = (etag, encoding, len(body))
+        compressed = compressed_cache.get(cache_key) if etag else None
+        if compressed is None:
+            with timed("compress"):
+                compressed = compress(body, encoding, level)
+            if etag:
+                compressed_cache.set(cache_key, compressed)
+
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            # the bytes differ per encoding, so the validator can only be weak
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,218 @@
+"""
+Deterministic bulk data generator for load testing.
+
+Same --seed + same catalog -> same users and records, so benchmark runs can be
+reproduced at any size:
+    flask --app backend/app.py datagen --users 100000 --records 1000000 --seed 42
+
+Unlike seed.py this never builds ORM objects per row: users and records are
+written with executemany in batches, every user shares one precomputed
+password hash, and ids are assigned up front so no row has to be read back.
+"""
+import math
+import random
+from datetime import date, datetime, timedelta
+
+from faker import Faker
+from sqlalchemy import func, insert, text
+from werkzeug.security import generate_password_hash
+
+from extensions import db
+from models import User, Course, Machine, Character, Record, Country, CurrentWR, WrReign, PersonalBest
+from seed import DEFAULT_PASSWORD, AIR_RIDE_TIME_RANGE, TOP_RIDE_TIME_RANGE, ensure_placeholder_proof, is_top_ride_course
+from cache import bump_data_version, bump_deletion_epoch
+import wr_index
+
+# --- tweak these knobs ---
+DEFAULT_USERS = 10_000
+DEFAULT_RECORDS = 100_000
+DEFAULT_DAYS = 730           # records are spread over this many days, ending yesterday
+BATCH_SIZE = 10_000          # rows per executemany
+USERNAME_POOL = 2_000        # distinct faker names; an index suffix keeps usernames unique
+
+
+# ---------- helpers ----------
+def format_time_ms(total_ms: int) -> str:
+    """12345 -> 0'12"345 (the inverse of schemas.parse_time_to_ms)."""
+    minutes, rest = divmod(total_ms, 60_000)
+    seconds, millis = divmod(rest, 1000)
+    return f"{minutes}'{seconds:02d}\"{millis:03d}"
+
+
+def split_laps(rng: random.Random, total_ms: int):
+    a = int(total_ms * rng.uniform(0.30, 0.36))
+    b = int(total_ms * rng.uniform(0.63, 0.70))
+    return (round(a / 1000.0, 3), round((b - a) / 1000.0, 3), round((total_ms - b) / 1000.0, 3))
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _bulk_insert(model, rows) -> int:
+    count = 0
+    for batch in _batches(rows):
+        db.session.execute(insert(model), batch)
+        count += len(batch)
+    return count
+
+
+def _sync_id_sequence(model):
+    """
+    Rows inserted with explicit ids don't advance a PostgreSQL serial sequence;
+    move it past them so the next normal insert (e.g. /api/register) doesn't collide.
+    SQLite just uses MAX(id) + 1, so there is nothing to do there.
+    """
+    if db.session.get_bind().dialect.name != "postgresql":
+        return
+    table = model.__tablename__
+    db.session.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT COALESCE(MAX(id), 1) FROM {table}))"
+    ))
+
+
+# ---------- users ----------
+def _user_rows(rng: random.Random, n: int, first_id: int, country_codes, password_hash: str):
+    fake = Faker()
+    fake.seed_instance(rng.randrange(2**32))
+    names = [fake.user_name() for _ in range(min(n, USERNAME_POOL))]
+
+    for i in range(n):
+        yield {
+            "id": first_id + i,
+            "username": f"{names[i % len(names)]}{i}"[:50],
+            "password_hash": password_hash,
+            "country_code": rng.choice(country_codes),
+        }
+
+
+def _skill_weights(rng: random.Random, n: int):
+    """
+    Cumulative weights for picking who submits a record: a few players submit
+    (and win) a lot, most submit rarely, like a real leaderboard.
+    """
+    total = 0.0
+    cum = []
+    for _ in range(n):
+        total += rng.paretovariate(1.2)
+        cum.append(total)
+    return cum
+
+
+# ---------- records ----------
+def _pair_record_rows(rng, course, machine, count, days, user_ids, user_cum_weights, character_ids, proof_url, today):
+    """
+    One (course, machine) history. Submissions land on random days; the
+    "attainable" time decays from a slow start towards a floor, and each run is
+    that target plus some noise, so WRs improve quickly at first and then
+    only rarely, the way a real WR progression does.
+    """
+    lo, hi = TOP_RIDE_TIME_RANGE if is_top_ride_course(course) else AIR_RIDE_TIME_RANGE
+    floor_ms = rng.uniform(lo, lo + (hi - lo) * 0.25) * 1000
+    start_ms = floor_ms * rng.uniform(1.15, 1.45)
+    decay = rng.uniform(2.0, 6.0)
+
+    offsets = sorted(rng.randrange(days) for _ in range(count))
+    users = rng.choices(user_ids, cum_weights=user_cum_weights, k=count)
+
+    for offset, user_id in zip(offsets, users):
+        progress = offset / days
+        target = floor_ms + (start_ms - floor_ms) * math.exp(-decay * progress)
+        total_ms = int(target * (1 + abs(rng.gauss(0, 0.04))))
+        lap1, lap2, lap3 = split_laps(rng, total_ms)
+
+        date_set = today - timedelta(days=days - offset)
+        yield {
+            "course_id": course.id,
+            "machine_id": machine.id,
+            "character_id": rng.choice(character_ids),
+            "user_id": user_id,
+            "time_str": format_time_ms(total_ms),
+            "time_ms": total_ms,
+            "date_set": date_set,
+            "lap1": lap1,
+            "lap2": lap2,
+            "lap3": lap3,
+            "proof_url": proof_url,
+            "created_at": datetime.combine(date_set, datetime.min.time()) + timedelta(seconds=rng.randrange(86_400)),
+        }
+
+
+def _record_rows(rng, pairs, total, days, user_ids, user_cum_weights, character_ids, proof_url, today):
+    per_pair, extra = divmod(total, len(pairs))
+    for i, (course, machine) in enumerate(pairs):
+        count = per_pair + (1 if i < extra else 0)
+        yield from _pair_record_rows(
+            rng, course, machine, count, days, user_ids, user_cum_weights, character_ids, proof_url, today
+        )
+
+
+# ---------- entrypoint ----------
+def wipe_generated_data():
+    """Deletes all records and users (and the WR tables derived from them). The catalog stays."""
+    WrReign.query.delete()
+    CurrentWR.query.delete()
+    PersonalBest.query.delete()
+    Record.query.delete()
+    User.query.delete()
+    bump_deletion_epoch()
+    db.session.commit()
+
+
+def generate(users: int = DEFAULT_USERS, records: int = DEFAULT_RECORDS, seed: int = 42,
+             days: int = DEFAULT_DAYS, upload_folder: str = None):
+    """
+    Inserts `users` users and `records` records spread evenly over every
+    (course, machine) pair, then rebuilds current_wrs / wr_reigns / personal_bests.
+    Returns (users written, records written).
+    """
+    from flask import current_app
+
+    rng = random.Random(seed)
+
+    courses = Course.query.order_by(Course.id).all()
+    machines = Machine.query.order_by(Machine.id).all()
+    character_ids = [c.id for c in Character.query.order_by(Character.id)]
+    country_codes = [c.code for c in Country.query.order_by(Country.code)] or ["us", "jp", "ca"]
+
+    if not courses or not machines or not character_ids:
+        raise RuntimeError("Catalog is empty; run `flask --app backend/app.py init-db` first.")
+    if users < 1:
+        raise ValueError("Need at least one user.")
+
+    if upload_folder is None:
+        upload_folder = current_app.config["UPLOAD_FOLDER"]
+    proof_url = ensure_placeholder_proof(upload_folder)
+
+    # hashing is deliberately slow; do it once and share it
+    password_hash = generate_password_hash(DEFAULT_PASSWORD)
+
+    first_id = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+    user_count = _bulk_insert(User, _user_rows(rng, users, first_id, country_codes, password_hash))
+    user_ids = list(range(first_id, first_id + user_count))
+    _sync_id_sequence(User)
+    print(f"Users written: {user_count}")
+
+    pairs = [(c, m) for c in courses for m in machines]
+    today = date.today()
+    record_count = _bulk_insert(Record, _record_rows(
+        rng, pairs, records, days, user_ids, _skill_weights(rng, user_count), character_ids, proof_url, today
+    ))
+    db.session.commit()
+    print(f"Records written: {record_count} across {len(pairs)} course/machine pairs")
+
+    wrs = wr_index.rebuild_current_wrs()
+    reigns = wr_index.rebuild_wr_reigns()
+    pbs = wr_index.rebuild_personal_bests()
+    bump_data_version()
+    db.session.commit()
+    print(f"Rebuilt current_wrs: {wrs} WRs, wr_reigns: {reigns} reigns, personal_bests: {pbs} rows.")
+
+    return user_count, record_count
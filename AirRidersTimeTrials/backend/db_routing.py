@@ -0,0 +1,60 @@
+"""
+Read/write connection split.
+
+GET requests to the read-only blueprints (READ_ONLY_BLUEPRINTS) run their
+queries on a separate "readonly" engine: a replica (READ_DATABASE_URL) or, for
+the SQLite file, a second connection pool opened with mode=ro. Heavy
+aggregation then never holds a lock on the connections create_record and
+update_me write through. Anything that flushes still goes to the primary.
+"""
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+
+from config import normalize_database_url
+
+READ_BIND = "readonly"
+
+
+def read_database_url(config):
+    """
+    READ_DATABASE_URL: "auto" -> a mode=ro twin of a SQLite file database (nothing for other
+    databases), "" -> no split, anything else -> that URL (e.g. a Postgres replica).
+    """
+    url = config.get("READ_DATABASE_URL", "auto")
+    if url != "auto":
+        return normalize_database_url(url) if url else None
+
+    primary = config["SQLALCHEMY_DATABASE_URI"]
+    if not primary.startswith("sqlite:///") or primary == "sqlite:///:memory:":
+        return None
+    path = primary[len("sqlite:///"):]
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
+
+
+class RoutingSession(Session):
+    """db.session class: sends reads to the readonly bind while the request is marked read-only."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get("db_read_only"):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def configure_read_engine(app):
+    """Call before db.init_app(app): adds the readonly bind to SQLALCHEMY_BINDS."""
+    url = read_database_url(app.config)
+    if url:
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        binds[READ_BIND] = url
+        app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def init_read_routing(app):
+    read_only = set(app.config.get("READ_ONLY_BLUEPRINTS", ()))
+
+    @app.before_request
+    def route_reads():
+        if request.method in ("GET", "HEAD") and request.blueprint in read_only:
+            g.db_read_only = True
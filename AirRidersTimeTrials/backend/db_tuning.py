@@ -0,0 +1,44 @@
+import weakref
+
+from sqlalchemy import event
+
+from extensions import db
+
+_tuned_engines = weakref.WeakSet()
+
+
+def _pragma_listener(pragmas):
+    def set_pragmas(dbapi_conn, conn_record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def init_db_tuning(app):
+    """
+    Applies the SQLITE_PROFILE pragmas (config.py) to every SQLite engine of the
+    app as each connection is opened. Other databases are left alone.
+    """
+    profile = app.config.get("SQLITE_PROFILE", "default")
+    profiles = app.config.get("SQLITE_PROFILES", {})
+    if profile not in profiles:
+        raise RuntimeError(f"Unknown SQLITE_PROFILE {profile!r}; pick one of {sorted(profiles)}")
+
+    pragmas = profiles[profile]
+    if not pragmas:
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name != "sqlite" or engine in _tuned_engines:
+                continue
+            engine_pragmas = pragmas
+            if engine.url.query.get("mode") == "ro":
+                # read-only connections can't change the journal mode (the primary already did)
+                engine_pragmas = {k: v for k, v in pragmas.items() if k != "journal_mode"}
+            event.listen(engine, "connect", _pragma_listener(engine_pragmas))
+            _tuned_engines.add(engine)
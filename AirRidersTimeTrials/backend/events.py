@@ -0,0 +1,161 @@
+"""
+In-process pub/sub behind the live WR feed (/api/stream/wrs).
+
+create_record publishes every committed record to the worker's broker right
+away. Records saved by *other* worker processes are picked up by one poller
+thread per worker: it checks the data version every STREAM_POLL_SECONDS and
+publishes the records it hasn't seen yet, and a "refresh" when rows already on
+screen changed (the deletion or display epoch in cache.py moved: deletes,
+country edits, reseeds). Sign-ups move the data version too but trigger nothing. Each open stream is a bounded
+queue; a client that stops reading is dropped rather than buffered forever.
+
+Events are best-effort (nothing is replayed after a reconnect) - the page
+refetches its tables whenever the stream (re)opens.
+"""
+import json
+import queue
+import threading
+from collections import deque
+
+from extensions import db
+from models import Record, WrReign
+from cache import data_version, deletion_epoch, display_epoch
+from stats_service import record_to_course_machine_row, record_to_course_page_row
+import wr_queries
+
+POLL_BATCH = 500
+# ids below the highest one seen that are looked at again on every poll: on PostgreSQL a
+# transaction can take an id and commit after a later one did, so "id > last seen" alone
+# would skip it for good. Already-published ids are filtered out with the seen set.
+POLL_LOOKBACK = 500
+SEEN_SIZE = 4 * (POLL_BATCH + POLL_LOOKBACK)
+
+
+def record_event(rec: Record, is_wr: bool) -> dict:
+    """Payload for one submission: rows in the formats the existing tables already render."""
+    return {
+        "recordId": rec.id,
+        "isWr": is_wr,
+        "courseKey": rec.course.course_key,
+        "row": record_to_course_machine_row(rec),
+        "courseRow": record_to_course_page_row(rec),
+    }
+
+
+def sse_message(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.subscribers = set()
+        self._seen = deque(maxlen=SEEN_SIZE)   # record ids already published, newest last
+        self._seen_set = set()
+        self._poller = None
+
+    # ---------- subscribers ----------
+    def subscribe(self, maxsize: int = 100) -> queue.Queue:
+        q = queue.Queue(maxsize=maxsize)
+        with self._lock:
+            self.subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            self.subscribers.discard(q)
+
+    def _broadcast(self, message: str, minor: bool = False):
+        """minor: a plain (non-WR) submission; streams opened without ?all=1 skip those."""
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait((minor, message))
+            except queue.Full:
+                # slow client: stop feeding it; its stream ends at the next get()
+                self.unsubscribe(q)
+                try:
+                    q.get_nowait()
+                    q.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    # ---------- publishers ----------
+    def _was_seen(self, record_id: int) -> bool:
+        with self._lock:
+            return record_id in self._seen_set
+
+    def _mark_seen(self, record_id: int) -> bool:
+        """False if this record was already published."""
+        with self._lock:
+            if record_id in self._seen_set:
+                return False
+            if len(self._seen) == self._seen.maxlen:
+                self._seen_set.discard(self._seen[0])
+            self._seen.append(record_id)
+            self._seen_set.add(record_id)
+            return True
+
+    def publish_record(self, payload: dict):
+        if self._mark_seen(payload["recordId"]):
+            self._broadcast(sse_message("record", payload), minor=not payload["isWr"])
+
+    def publish_refresh(self):
+        """Rows already on screen changed (account delete, country edit): clients refetch what they show."""
+        self._broadcast(sse_message("refresh", {}))
+
+    # ---------- cross-worker poller ----------
+    def ensure_poller(self, app):
+        with self._lock:
+            if self._poller is not None:
+                return
+            self._poller = threading.Thread(target=self._poll_loop, args=(app,), name="wr-stream-poller", daemon=True)
+        self._poller.start()
+
+    def _poll_loop(self, app):
+        interval = app.config.get("STREAM_POLL_SECONDS", 2.0)
+        with app.app_context():
+            version, epoch = data_version(), (deletion_epoch(), display_epoch())
+            last_id = db.session.query(db.func.max(Record.id)).scalar() or 0
+            # the lookback window starts out as already published
+            for (rid,) in db.session.query(Record.id).filter(Record.id > last_id - POLL_LOOKBACK):
+                self._mark_seen(rid)
+            db.session.remove()
+
+        stop = threading.Event()
+        while not stop.wait(interval):
+            try:
+                with app.app_context():
+                    version, epoch, last_id = self._poll_once(version, epoch, last_id)
+                    db.session.remove()
+            except Exception as e:  # keep polling through a locked/restarting database
+                app.logger.warning("wr stream poll failed: %s", e)
+
+    def _poll_once(self, version, epoch, last_id):
+        new_version = data_version()
+        if new_version == version:
+            return version, epoch, last_id
+
+        new_epoch = (deletion_epoch(), display_epoch())
+        window = POLL_LOOKBACK + POLL_BATCH
+        candidates = [
+            rid for (rid,) in
+            db.session.query(Record.id).filter(Record.id > last_id - POLL_LOOKBACK).order_by(Record.id).limit(window)
+        ]
+        ids = [rid for rid in candidates if not self._was_seen(rid)][:POLL_BATCH]
+        if len(candidates) == window:
+            new_version = version  # more to fetch; look again next tick
+        if ids:
+            recs = wr_queries.with_relations(Record.query.filter(Record.id.in_(ids))).order_by(Record.id).all()
+            wr_ids = {rid for (rid,) in db.session.query(WrReign.record_id).filter(WrReign.record_id.in_(ids))}
+            for r in recs:
+                self.publish_record(record_event(r, r.id in wr_ids))
+            last_id = max(last_id, ids[-1])
+        if new_epoch != epoch:
+            # a delete or an edit (e.g. a player's country) changed rows already on screen
+            self.publish_refresh()
+        return new_version, new_epoch, last_id
+
+
+broker = Broker()
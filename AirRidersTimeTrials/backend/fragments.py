@@ -0,0 +1,113 @@
+"""
+Pre-serialized JSON rows for the big list endpoints (WR snapshot, course history).
+
+A record's row only changes when its player edits their profile, when the
+catalog is re-seeded (course/machine/character names and icons), or when the
+day rolls over (the "days" column). Rows are cached as encoded bytes under a
+key made of everything they depend on, so a profile edit or a reseed run by
+`flask init-db` in another process simply produces new keys - nothing has to
+be invalidated across workers - and a response is assembled by joining bytes
+instead of building and encoding the same dicts on every request. Old keys
+fall out of the LRU.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from flask import current_app
+
+from instrumentation import timed
+
+
+class FragmentCache:
+    """Thread-safe LRU of key -> encoded row."""
+
+    def __init__(self, max_entries: int = 50_000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value: bytes):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def init_fragments(app):
+    app.extensions["row_fragments"] = FragmentCache(app.config.get("FRAGMENT_CACHE_SIZE", 50_000))
+
+def fragment_cache() -> FragmentCache:
+    return current_app.extensions["row_fragments"]
+
+
+def _key(kind: str, r, today: str):
+    # everything editable a row reads: the user's profile and the catalog rows (all eager-loaded)
+    return (
+        kind, r.id, today,
+        r.user.username, r.user.country_code,
+        r.course.course_key, r.course.name,
+        r.machine.name, r.machine.icon,
+        r.character.name, r.character.icon,
+    )
+
+
+def encoded_rows(kind: str, records, row_fn):
+    """
+    [row_fn(r) encoded as JSON bytes, ...]. `kind` names the row format;
+    records must have their relations loaded (wr_queries.with_relations).
+    """
+    encode = current_app.json.dumps_bytes
+    if not current_app.config.get("FRAGMENT_CACHE_SIZE", 50_000):
+        return [encode(row_fn(r)) for r in records]
+
+    cache = fragment_cache()
+    today = date.today().isoformat()
+    out = []
+    for r in records:
+        key = _key(kind, r, today)
+        body = cache.get(key)
+        if body is None:
+            body = encode(row_fn(r))
+            cache.set(key, body)
+        out.append(body)
+    return out
+
+
+def json_list(kind: str, records, row_fn) -> bytes:
+    return b"[" + b",".join(encoded_rows(kind, records, row_fn)) + b"]"
+
+
+def list_response(kind: str, records, row_fn):
+    """Same body as jsonify([row_fn(r) for r in records]), assembled from cached rows."""
+    with timed("serialize"):
+        return current_app.json.raw_response(json_list(kind, records, row_fn) + b"\n")
+
+
+def object_response(**parts):
+    """
+    A JSON object response whose values are already-encoded bytes, e.g.
+        object_response(items=json_list(...), nextCursor=dumps_bytes(cursor))
+    Keys are written sorted, like jsonify does.
+    """
+    with timed("serialize"):
+        encode = current_app.json.dumps_bytes
+        body = b"{" + b",".join(encode(k) + b":" + parts[k] for k in sorted(parts)) + b"}\n"
+        return current_app.json.raw_response(body)
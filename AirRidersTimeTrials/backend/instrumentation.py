@@ -0,0 +1,146 @@
+import cProfile
+import os
+import random
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# -------------------- SQL QUERY COUNTER / TIMER --------------------
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.sql_queries = g.get("sql_queries", 0) + 1
+        conn.info["query_start"] = time.perf_counter()
+
+
+def _time_statement(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop("query_start", None)
+    if start is not None and has_request_context():
+        add_timing("db", (time.perf_counter() - start) * 1000)
+
+
+def sql_query_count() -> int:
+    """Number of SQL statements executed so far in the current request."""
+    return g.get("sql_queries", 0)
+
+
+# -------------------- SERVER-TIMING --------------------
+def add_timing(name: str, ms: float):
+    """Adds `ms` to the named Server-Timing metric of the current request."""
+    timings = g.setdefault("timings", {})
+    timings[name] = timings.get(name, 0.0) + ms
+
+
+@contextmanager
+def timed(name: str):
+    """
+    Times a block into the Server-Timing header:
+        with timed("aggregate"):
+            ...
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context():
+            add_timing(name, (time.perf_counter() - start) * 1000)
+
+
+def server_timing_header(total_ms: float) -> str:
+    """
+    db        -> time inside SQL statements (desc = statement count)
+    serialize -> jsonify (dict -> JSON text -> Response)
+    app       -> everything else in the handler: ORM hydration, Python loops, ...
+    total     -> before_request to after_request
+    plus any metric added with timed()/add_timing().
+    """
+    timings = dict(g.get("timings", {}))
+    db_ms = timings.pop("db", 0.0)
+    serialize_ms = timings.pop("serialize", 0.0)
+
+    parts = [
+        f'db;dur={db_ms:.2f};desc="{sql_query_count()} queries"',
+        f"serialize;dur={serialize_ms:.2f}",
+    ]
+    for name, ms in timings.items():
+        parts.append(f"{name};dur={ms:.2f}")
+    parts.append(f"app;dur={max(total_ms - db_ms - serialize_ms, 0.0):.2f}")
+    parts.append(f"total;dur={total_ms:.2f}")
+    if g.get("cache_status"):
+        parts.append(f'cache;desc="{g.cache_status}"')
+    return ", ".join(parts)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """
+    Default provider that books the time spent building JSON responses as "serialize".
+    Subclasses change how the body is built by overriding _response().
+    """
+
+    def response(self, *args, **kwargs):
+        start = time.perf_counter()
+        resp = self._response(*args, **kwargs)
+        if has_request_context():
+            add_timing("serialize", (time.perf_counter() - start) * 1000)
+        return resp
+
+    def _response(self, *args, **kwargs):
+        return super().response(*args, **kwargs)
+
+
+# -------------------- SAMPLED PROFILES --------------------
+def _profile_path(folder: str, total_ms: float) -> str:
+    endpoint = (request.endpoint or "unknown").replace(".", "-")
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"{int(now * 1000) % 1000:03d}"
+    return os.path.join(folder, f"{stamp}-{endpoint}-{int(total_ms)}ms-{os.getpid()}.prof")
+
+
+def init_instrumentation(app):
+    """
+    Counts (and times) every SQL statement run while handling a request (all engines).
+      SQL_COUNT_HEADER     -> X-SQL-Queries header, to check list endpoints run a constant number of statements
+      SERVER_TIMING        -> Server-Timing header (db / serialize / app / total), shows up in the browser devtools
+      PROFILE_SAMPLE_RATE  -> fraction of requests run under cProfile, dumped to PROFILE_DIR
+                              (open with `python -m pstats file.prof` or snakeviz)
+    """
+    if not event.contains(Engine, "before_cursor_execute", _count_statement):
+        event.listen(Engine, "before_cursor_execute", _count_statement)
+    if not event.contains(Engine, "after_cursor_execute", _time_statement):
+        event.listen(Engine, "after_cursor_execute", _time_statement)
+
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+        rate = app.config.get("PROFILE_SAMPLE_RATE", 0.0)
+        if rate and random.random() < rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                return  # another thread is already being profiled (one profiler per process on 3.12+)
+            g.profiler = profiler
+
+    @app.after_request
+    def add_instrumentation_headers(response):
+        total_ms = (time.perf_counter() - g.get("request_start", time.perf_counter())) * 1000
+
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            folder = app.config.get("PROFILE_DIR")
+            os.makedirs(folder, exist_ok=True)
+            profiler.dump_stats(_profile_path(folder, total_ms))
+
+        if app.config.get("SQL_COUNT_HEADER"):
+            response.headers["X-SQL-Queries"] = str(sql_query_count())
+        if app.config.get("SERVER_TIMING"):
+            response.headers["Server-Timing"] = server_timing_header(total_ms)
+        return response
@@ -0,0 +1,148 @@
+"""
+In-memory leaderboards: every player's best time per (course, machine), kept
+in a sorted list per pair so rank lookups are a bisect (O(log n)) instead of
+sorting that pair's records on every request.
+
+Each app (so each worker process) holds its own copy in app.extensions - the
+benchmark and the tests build several apps on different databases in one
+process, and their boards must not mix. It is loaded on first use and kept
+current by comparing the data version (cache.py) on every read: new records
+(id > the last one seen) are applied incrementally, and a change of the
+deletion epoch (an account was deleted) makes it reload from scratch.
+"""
+import threading
+from bisect import bisect_left, insort
+
+from flask import current_app
+
+from extensions import db
+from models import Record
+from cache import data_version, deletion_epoch
+import wr_queries
+
+
+class PairBoard:
+    """
+    Sorted keys (time_ms, date_set, created_at, record_id, user_id) - the WR
+    tie-break order, one key per player - plus user_id -> key.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.by_user = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def offer(self, key) -> bool:
+        """Adds a record; only counts if it beats that player's current best. True if it did."""
+        user_id = key[4]
+        old = self.by_user.get(user_id)
+        if old is not None:
+            if old <= key:
+                return False
+            del self.keys[bisect_left(self.keys, old)]
+        insort(self.keys, key)
+        self.by_user[user_id] = key
+        return True
+
+    def rank_of_user(self, user_id):
+        """1-based rank of the player's best, or None if they have no time here."""
+        key = self.by_user.get(user_id)
+        if key is None:
+            return None
+        return bisect_left(self.keys, key) + 1
+
+    def rank_for_time(self, time_ms: int) -> int:
+        """Rank a run of `time_ms` would get right now (ties go to the time already set)."""
+        return bisect_left(self.keys, (time_ms + 1,)) + 1
+
+    def page(self, start: int, limit: int):
+        """
+        [(rank, key), ...] starting at 0-based index `start`. A negative start
+        (a window around someone near the top) is cut off, not shifted down.
+        """
+        if start < 0:
+            limit += start
+            start = 0
+        if limit <= 0:
+            return []
+        return [(start + i + 1, key) for i, key in enumerate(self.keys[start:start + limit])]
+
+
+class Leaderboards:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.boards = {}
+        self.loaded = False
+        self.version = None
+        self.epoch = None
+        self.max_record_id = 0
+
+    # ---------- loading ----------
+    def _apply(self, rows):
+        for course_id, machine_id, user_id, record_id, time_ms, date_set, created_at in rows:
+            board = self.boards.get((course_id, machine_id))
+            if board is None:
+                board = self.boards[(course_id, machine_id)] = PairBoard()
+            board.offer((time_ms, date_set, created_at, record_id, user_id))
+            self.max_record_id = max(self.max_record_id, record_id)
+
+    def _load_all(self):
+        self.boards = {}
+        self.max_record_id = 0
+        self._apply(wr_queries.personal_best_columns())
+        self.loaded = True
+
+    def _apply_since(self, record_id: int):
+        rows = (
+            db.session.query(
+                Record.course_id, Record.machine_id, Record.user_id, Record.id,
+                Record.time_ms, Record.date_set, Record.created_at,
+            )
+            .filter(Record.id > record_id)
+            .order_by(Record.id)
+        )
+        self._apply(rows)
+
+    def ensure_fresh(self):
+        """Two tiny reads when nothing changed; otherwise catch up (or reload after deletes)."""
+        version = data_version()
+        if self.loaded and version == self.version:
+            return
+
+        epoch = deletion_epoch()
+        with self._lock:
+            if self.loaded and version == self.version:
+                return
+            if not self.loaded or epoch != self.epoch:
+                self._load_all()
+            else:
+                self._apply_since(self.max_record_id)
+            self.version = version
+            self.epoch = epoch
+
+    # ---------- reads ----------
+    def board(self, course_id: int, machine_id: int) -> PairBoard:
+        self.ensure_fresh()
+        return self.boards.get((course_id, machine_id)) or PairBoard()
+
+    # ---------- writes ----------
+    def on_record_created(self, rec: Record):
+        """
+        Call after the record is committed. Other workers pick it up through the data version.
+        Catches up on everything after the last record seen rather than applying `rec` alone:
+        records other workers saved in between have lower ids, and jumping max_record_id
+        past them would make ensure_fresh() skip them for good.
+        """
+        if not self.loaded:
+            return
+        with self._lock:
+            self._apply_since(self.max_record_id)
+
+
+def init_leaderboards(app):
+    app.extensions["leaderboards"] = Leaderboards()
+
+def leaderboards() -> Leaderboards:
+    return current_app.extensions["leaderboards"]
@@ -0,0 +1,283 @@
+"""
+Prometheus text-format metrics at /metrics, without extra dependencies.
+
+Each worker process keeps its own counters/histograms/gauges in memory. With
+METRICS_DIR set (do this whenever you run more than one worker), every process
+also writes a snapshot of them to METRICS_DIR/metrics-<pid>.json about once a
+second, and /metrics - whichever worker answers it - merges all the snapshots:
+counters and histograms are summed (dead workers' totals are kept so rates
+don't jump backwards), gauges are summed over live processes only.
+Empty the directory when the server (re)starts.
+"""
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from flask import Blueprint, current_app, g, request
+from sqlalchemy import event
+
+from extensions import db
+
+bp_metrics = Blueprint("metrics", __name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help)
+METRICS = {
+    "airriders_http_requests_total": ("counter", "HTTP requests handled."),
+    "airriders_http_request_duration_seconds": ("histogram", "Time spent handling HTTP requests."),
+    "airriders_http_requests_in_flight": ("gauge", "HTTP requests currently being handled."),
+    "airriders_sql_statements_total": ("counter", "SQL statements executed while handling requests."),
+    "airriders_sql_duration_seconds_total": ("counter", "Time spent in SQL statements while handling requests."),
+    "airriders_response_cache_requests_total": ("counter", "Cached JSON endpoint lookups by result."),
+    "airriders_db_connection_checkouts_total": ("counter", "Connections checked out of the SQLAlchemy pool."),
+    "airriders_db_pool_checked_out": ("gauge", "Connections currently checked out of the pool."),
+    "airriders_db_pool_size": ("gauge", "Configured pool size (summed over workers)."),
+    "airriders_uploads_total": ("counter", "Proof files uploaded."),
+    "airriders_upload_bytes_total": ("counter", "Bytes of proof files uploaded."),
+    "airriders_upload_seconds_total": ("counter", "Time spent writing proof files to disk."),
+}
+
+
+# -------------------- REGISTRY --------------------
+class Registry:
+    """One per process. Label sets are stored as sorted (key, value) tuples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.gauges = defaultdict(float)
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self.last_flush = 0.0
+
+    def inc(self, name, labels=(), value=1.0):
+        with self._lock:
+            self.counters[(name, labels)] += value
+
+    def set_gauge(self, name, labels=(), value=0.0):
+        with self._lock:
+            self.gauges[(name, labels)] = value
+
+    def add_gauge(self, name, labels=(), value=1.0):
+        with self._lock:
+            self.gauges[(name, labels)] += value
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            h = self.histograms.get((name, labels))
+            if h is None:
+                h = self.histograms[(name, labels)] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    h[i] += 1
+            h[-2] += value
+            h[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "counters": [[n, list(l), v] for (n, l), v in self.counters.items()],
+                "gauges": [[n, list(l), v] for (n, l), v in self.gauges.items()],
+                "histograms": [[n, list(l), list(h)] for (n, l), h in self.histograms.items()],
+            }
+
+
+registry = Registry()
+
+
+def labels(**kw):
+    return tuple(sorted((k, str(v)) for k, v in kw.items()))
+
+
+def record_upload(nbytes: int, seconds: float):
+    """Call from the upload handler after the proof file is on disk."""
+    registry.inc("airriders_uploads_total")
+    registry.inc("airriders_upload_bytes_total", value=nbytes)
+    registry.inc("airriders_upload_seconds_total", value=seconds)
+
+
+# -------------------- MULTI-PROCESS SNAPSHOTS --------------------
+def _sample_pool():
+    pool = db.engine.pool
+    if hasattr(pool, "checkedout"):
+        registry.set_gauge("airriders_db_pool_checked_out", value=pool.checkedout())
+    if hasattr(pool, "size"):
+        registry.set_gauge("airriders_db_pool_size", value=pool.size())
+
+
+def flush(folder: str):
+    """Atomically writes this process's snapshot to the shared folder."""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"metrics-{os.getpid()}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)
+    registry.last_flush = time.monotonic()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect(folder: str = None):
+    """Merged (counters, gauges, histograms) for this process, or for every process that wrote to `folder`."""
+    if folder:
+        snapshots = []
+        for path in glob.glob(os.path.join(folder, "metrics-*.json")):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # being replaced right now; it will be there next scrape
+    else:
+        snapshots = [registry.snapshot()]
+
+    counters = defaultdict(float)
+    gauges = defaultdict(float)
+    histograms = {}
+    for snap in snapshots:
+        for name, lbls, value in snap["counters"]:
+            counters[(name, tuple(map(tuple, lbls)))] += value
+        if snap["pid"] == os.getpid() or _pid_alive(snap["pid"]):
+            for name, lbls, value in snap["gauges"]:
+                gauges[(name, tuple(map(tuple, lbls)))] += value
+        for name, lbls, h in snap["histograms"]:
+            key = (name, tuple(map(tuple, lbls)))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], h)]
+            else:
+                histograms[key] = list(h)
+    return counters, gauges, histograms
+
+
+# -------------------- TEXT EXPOSITION --------------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _fmt_labels(lbls, extra=()):
+    items = list(lbls) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+def _fmt_value(v) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+def render(counters, gauges, histograms) -> str:
+    by_name = defaultdict(list)
+    for (name, lbls), v in list(counters.items()) + list(gauges.items()):
+        by_name[name].append((lbls, v))
+    for (name, lbls), h in histograms.items():
+        by_name[name].append((lbls, h))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = METRICS.get(name, ("untyped", ""))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for lbls, v in sorted(by_name[name]):
+            if kind != "histogram":
+                lines.append(f"{name}{_fmt_labels(lbls)} {_fmt_value(v)}")
+                continue
+            # observe() already keeps the buckets cumulative
+            for bound, count in zip(LATENCY_BUCKETS, v):
+                lines.append(f"{name}_bucket{_fmt_labels(lbls, [('le', repr(bound))])} {_fmt_value(count)}")
+            lines.append(f"{name}_bucket{_fmt_labels(lbls, [('le', '+Inf')])} {_fmt_value(v[-1])}")
+            lines.append(f"{name}_sum{_fmt_labels(lbls)} {_fmt_value(v[-2])}")
+            lines.append(f"{name}_count{_fmt_labels(lbls)} {_fmt_value(v[-1])}")
+    return "\n".join(lines) + "\n"
+
+
+# -------------------- FLASK WIRING --------------------
+def _count_checkout(dbapi_conn, conn_record, conn_proxy):
+    registry.inc("airriders_db_connection_checkouts_total")
+
+
+def init_metrics(app):
+    """Request hooks + the pool listener. Register bp_metrics too for the /metrics endpoint."""
+    if not app.config.get("METRICS_ENABLED", False):
+        return
+
+    with app.app_context():
+        if not event.contains(db.engine.pool, "checkout", _count_checkout):
+            event.listen(db.engine.pool, "checkout", _count_checkout)
+
+    @app.before_request
+    def metrics_start():
+        g.metrics_start = time.perf_counter()
+        registry.add_gauge("airriders_http_requests_in_flight")
+
+    @app.after_request
+    def metrics_record(response):
+        if "metrics_start" not in g:
+            return response  # an earlier before_request hook answered; metrics_start never ran
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        blueprint = request.blueprint or "app"
+        elapsed = time.perf_counter() - g.metrics_start
+
+        registry.inc("airriders_http_requests_total", labels(
+            blueprint=blueprint, route=route, method=request.method, status=response.status_code
+        ))
+        registry.observe("airriders_http_request_duration_seconds", labels(
+            blueprint=blueprint, route=route, method=request.method
+        ), elapsed)
+
+        sql = labels(blueprint=blueprint)
+        registry.inc("airriders_sql_statements_total", sql, g.get("sql_queries", 0))
+        registry.inc("airriders_sql_duration_seconds_total", sql, g.get("timings", {}).get("db", 0.0) / 1000)
+
+        if g.get("cache_status"):
+            registry.inc("airriders_response_cache_requests_total", labels(
+                endpoint=request.endpoint, result=g.cache_status
+            ))
+        return response
+
+    @app.teardown_request
+    def metrics_finish(exc):
+        # teardown runs even when metrics_start was skipped; only undo an increment that happened
+        if g.pop("metrics_start", None) is not None:
+            registry.add_gauge("airriders_http_requests_in_flight", value=-1)
+
+        folder = app.config.get("METRICS_DIR")
+        interval = app.config.get("METRICS_FLUSH_INTERVAL", 1.0)
+        if folder and time.monotonic() - registry.last_flush >= interval:
+            try:
+                _sample_pool()
+                flush(folder)
+            except OSError as e:
+                app.logger.warning("metrics flush failed: %s", e)
+
+
+def _may_read_metrics() -> bool:
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        auth = request.headers.get("Authorization", "")
+        return hmac.compare_digest(auth.encode("utf-8"), f"Bearer {token}".encode("utf-8"))
+    return request.remote_addr in current_app.config.get("METRICS_ALLOWED_IPS", ())
+
+
+@bp_metrics.get("/metrics")
+def metrics_endpoint():
+    if not current_app.config.get("METRICS_ENABLED", False):
+        return {"error": "metrics disabled"}, 404
+    if not _may_read_metrics():
+        return {"error": "forbidden"}, 403
+
+    folder = current_app.config.get("METRICS_DIR")
+    _sample_pool()
+    if folder:
+        flush(folder)  # include this worker's latest numbers
+    body = render(*collect(folder))
+    return current_app.response_class(body, mimetype="text/plain; version=0.0.4")
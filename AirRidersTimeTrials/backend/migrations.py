@@ -0,0 +1,81 @@
+"""
+Tiny in-place schema migrations.
+
+db.create_all() only creates tables that don't exist yet; it never touches
+tables that are already in an existing air_riders.db (new indexes, columns...).
+Each entry in MIGRATIONS runs once per database, in order, and is recorded in
+the schema_migrations table.
+
+To add one: append (next_version, "description", [sql, ...]) to MIGRATIONS.
+Statements should be idempotent (IF NOT EXISTS) because a brand-new database
+already got everything from create_all().
+"""
+from datetime import datetime
+
+from sqlalchemy import text
+
+from extensions import db
+
+
+MIGRATIONS = [
+    (1, "records hot-path indexes", [
+        "CREATE INDEX IF NOT EXISTS ix_records_course_machine_time "
+        "ON records (course_id, machine_id, time_ms, date_set, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_records_course_date ON records (course_id, date_set, id)",
+        "CREATE INDEX IF NOT EXISTS ix_records_date_set ON records (date_set)",
+        "CREATE INDEX IF NOT EXISTS ix_records_user_id ON records (user_id)",
+    ]),
+    (2, "current_wrs indexes", [
+        "CREATE INDEX IF NOT EXISTS ix_current_wrs_user_id ON current_wrs (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_current_wrs_date_set ON current_wrs (date_set)",
+        # refresh planner statistics so the new indexes actually get picked
+        "ANALYZE",
+    ]),
+]
+
+
+def _ensure_migrations_table():
+    db.session.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INTEGER PRIMARY KEY,"
+        " name VARCHAR(120) NOT NULL,"
+        " applied_at TIMESTAMP NOT NULL"
+        ")"
+    ))
+    db.session.commit()
+
+
+def current_version() -> int:
+    _ensure_migrations_table()
+    v = db.session.execute(text("SELECT MAX(version) FROM schema_migrations")).scalar()
+    return v or 0
+
+
+def run_migrations() -> int:
+    """
+    Applies every migration newer than the database's version.
+    Each migration runs in its own transaction. Returns how many were applied.
+    """
+    applied = 0
+    version = current_version()
+
+    for number, name, statements in MIGRATIONS:
+        if number <= version:
+            continue
+
+        try:
+            for sql in statements:
+                db.session.execute(text(sql))
+            db.session.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": number, "n": name, "t": datetime.utcnow()},
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        print(f"Applied migration {number}: {name}")
+        applied += 1
+
+    return applied
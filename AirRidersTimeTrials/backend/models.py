@@ -62,3 +62,95 @@ class Record(db.Model):
     machine = db.relationship("Machine")
     character = db.relationship("Character")
     user = db.relationship("User", back_populates="records")
+
+    # keep in sync with migrations.py (existing databases get these from there)
+    __table_args__ = (
+        # best-per-(course, machine) lookups in WR order
+        db.Index("ix_records_course_machine_time", "course_id", "machine_id", "time_ms", "date_set", "created_at", "id"),
+        # course history, newest first
+        db.Index("ix_records_course_date", "course_id", "date_set", "id"),
+        db.Index("ix_records_date_set", "date_set"),
+        db.Index("ix_records_user_id", "user_id"),
+    )
+
+
+class CurrentWR(db.Model):
+    """
+    Materialized "current WR" per (course, machine).
+    Kept in sync by wr_index.py whenever records are added or removed,
+    so the stats pages don't have to re-aggregate the whole records table.
+    """
+    __tablename__ = "current_wrs"
+    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), primary_key=True)
+    machine_id = db.Column(db.Integer, db.ForeignKey("machines.id"), primary_key=True)
+
+    record_id = db.Column(db.Integer, db.ForeignKey("records.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    time_ms = db.Column(db.Integer, nullable=False)
+    date_set = db.Column(db.Date, nullable=False)
+
+    record = db.relationship("Record")
+
+    __table_args__ = (
+        db.Index("ix_current_wrs_user_id", "user_id"),
+        db.Index("ix_current_wrs_date_set", "date_set"),
+    )
+
+
+class WrReign(db.Model):
+    """
+    One row per time a record became the WR for its (course, machine).
+    end_date is None while the reign is still going; "days held" is worked out
+    at read time so nothing has to be rewritten when the date rolls over.
+    Kept in sync by wr_index.py.
+    """
+    __tablename__ = "wr_reigns"
+    id = db.Column(db.Integer, primary_key=True)
+
+    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), nullable=False)
+    machine_id = db.Column(db.Integer, db.ForeignKey("machines.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    record_id = db.Column(db.Integer, db.ForeignKey("records.id"), nullable=False)
+    time_ms = db.Column(db.Integer, nullable=False)
+
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_wr_reigns_pair", "course_id", "machine_id", "start_date"),
+        db.Index("ix_wr_reigns_user_id", "user_id"),
+    )
+
+
+class PersonalBest(db.Model):
+    """
+    Each player's best record per (course, machine), so a profile page is one
+    indexed read instead of a scan of their records. Kept in sync by wr_index.py.
+    """
+    __tablename__ = "personal_bests"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), primary_key=True)
+    machine_id = db.Column(db.Integer, db.ForeignKey("machines.id"), primary_key=True)
+
+    record_id = db.Column(db.Integer, db.ForeignKey("records.id"), nullable=False)
+    time_ms = db.Column(db.Integer, nullable=False)
+    date_set = db.Column(db.Date, nullable=False)
+
+    record = db.relationship("Record")
+
+
+class DataVersion(db.Model):
+    """
+    Single-row counter bumped by every write that can change what the stats
+    endpoints return (see cache.py). Lives in the DB so all workers see it.
+    """
+    __tablename__ = "data_version"
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AppMeta(db.Model):
+    """Small key/value store for bookkeeping (e.g. the catalog seed fingerprint)."""
+    __tablename__ = "app_meta"
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.String(255), nullable=True)
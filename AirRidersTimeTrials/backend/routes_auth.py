@@ -1,16 +1,23 @@
 from flask import Blueprint, jsonify, request
+from marshmallow import ValidationError
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from extensions import db
 from models import User
 from schemas import RegisterSchema, LoginSchema, UpdateUserSchema
+import wr_index
+from cache import bump_data_version, bump_deletion_epoch, bump_display_epoch
 
 bp_auth = Blueprint("auth", __name__)
 
 @bp_auth.post("/api/register")
 def register():
     payload = request.get_json(force=True)
-    data = RegisterSchema().load(payload)
+    try:
+        data = RegisterSchema().load(payload)
+    except ValidationError as e:
+        # e.g. an unknown country code (users.country_code is a foreign key on PostgreSQL)
+        return jsonify({"error": str(e.messages)}), 422
 
     username = data["username"].strip()
     password = data["password"]
@@ -27,6 +34,7 @@ def register():
         country_code=country_code
     )
     db.session.add(user)
+    bump_data_version()  # player rankings list every user
     db.session.commit()
 
 #changed the tokens to strings
@@ -78,6 +86,8 @@ def update_me():
     if "country_code" in data:
         code = data["country_code"]
         user.country_code = code.lower() if code else None
+        bump_data_version()
+        bump_display_epoch()  # their flag is on screen in every table they appear in
 
     db.session.commit()
 
@@ -95,7 +105,13 @@ def delete_me():
         return jsonify({"error": "User not found"}), 404
 
     try:
+        # WRs this user holds have to fall back to the next best record
+        pairs = wr_index.forget_user(user.id)
         db.session.delete(user)
+        db.session.flush()
+        wr_index.recompute_pairs(pairs)
+        bump_data_version()
+        bump_deletion_epoch()
         db.session.commit()
         return jsonify({"message": "Account deleted successfully"}), 200
     except Exception as e:
@@ -3,12 +3,16 @@ import os
 from flask import Blueprint, jsonify
 from extensions import db
 from models import Country
+from cache import cached_response
 
 bp_countries = Blueprint("countries", __name__)
 
 @bp_countries.get("/api/countries")
+@cached_response
 def get_countries():
-    countries = Country.query.order_by(Country.name.asc()).all()
+    # sorted in Python: ORDER BY on text follows the database's collation, which
+    # differs between SQLite and PostgreSQL (accented names like "Åland Islands")
+    countries = sorted(Country.query.all(), key=lambda c: c.name)
     return jsonify([{"code": c.code, "name": c.name} for c in countries])
 
 def load_countries_from_json():
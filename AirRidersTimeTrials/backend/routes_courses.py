@@ -1,157 +1,189 @@
 # routes_courses.py
 from datetime import date
-from flask import Blueprint, jsonify
-from extensions import db
-from models import Course, Record, User
+from flask import Blueprint, jsonify, request, current_app
+from sqlalchemy import or_, and_
+from models import Course, Record, User, Machine
+import wr_queries
+import stats_service
+from stats_service import days_since, static_path
+from cache import cached_response
+import fragments
+from leaderboard import leaderboards
+from schemas import parse_time_to_ms
 
 bp_courses = Blueprint("course", __name__)
 
-def days_since(d: date) -> int:
-    if not d:
-        return 0
-    return max((date.today() - d).days, 0)
-
 @bp_courses.get("/api/course/<course_key>")
+@cached_response
 def get_course(course_key):
     course = Course.query.filter_by(course_key=course_key).first()
     if not course:
         return jsonify({"error": "Course not found"}), 404
 
-    # ----------------------------
-    # Current Machine WRs:
-    # best time per machine for this course (lowest time_ms)
-    # ----------------------------
-    best_per_machine = (
-        db.session.query(
-            Record.machine_id,
-            db.func.min(Record.time_ms).label("best_ms")
-        )
-        .filter(Record.course_id == course.id)
-        .group_by(Record.machine_id)
-        .subquery()
-    )
+    return jsonify(stats_service.course_page(course))
+
+
+# ----------------------------
+# History: /api/course/<course_key>/history
+# newest first, keyset paginated on (date_set, id) so deep pages cost the
+# same as the first one (no OFFSET scans).
+#   ?limit=50             page size (capped by HISTORY_MAX_PAGE_SIZE)
+#   ?cursor=2025-12-18.42 "nextCursor" from the previous page
+#   ?machine=Warp Star    only this machine
+#   ?player=someone       only this player
+# ----------------------------
+def history_row(r: Record):
+    return {
+        "id": r.id,
+        "date": r.date_set.isoformat() if r.date_set else "",
+        "machineName": r.machine.name,
+        "machineIcon": static_path(r.machine.icon),
+        "time": r.time_str,
+        "player": r.user.username,
+        "nationCode": (r.user.country_code or "").lower(),
+        "days": days_since(r.date_set),
+        "lap1": r.lap1,
+        "lap2": r.lap2,
+        "lap3": r.lap3,
+        "charIcon": static_path(r.character.icon)
+    }
+
+def parse_history_cursor(cursor: str):
+    """ "2025-12-18.42" -> (date(2025, 12, 18), 42) """
+    d, rec_id = cursor.split(".", 1)
+    return date.fromisoformat(d), int(rec_id)
+
+@bp_courses.get("/api/course/<course_key>/history")
+@cached_response
+def get_course_history(course_key):
+    course = Course.query.filter_by(course_key=course_key).first()
+    if not course:
+        return jsonify({"error": "Course not found"}), 404
+
+    default_size = current_app.config.get("HISTORY_PAGE_SIZE", 50)
+    max_size = current_app.config.get("HISTORY_MAX_PAGE_SIZE", 200)
+    try:
+        limit = int(request.args.get("limit", default_size))
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+    limit = min(max(limit, 1), max_size)
+
+    q = Record.query.filter(Record.course_id == course.id)
+
+    machine_name = request.args.get("machine")
+    if machine_name:
+        machine = Machine.query.filter_by(name=machine_name).first()
+        if not machine:
+            return jsonify({"error": "Machine not found"}), 404
+        q = q.filter(Record.machine_id == machine.id)
+
+    player = request.args.get("player")
+    if player:
+        user = User.query.filter_by(username=player).first()
+        if not user:
+            return jsonify({"error": "Player not found"}), 404
+        q = q.filter(Record.user_id == user.id)
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            cur_date, cur_id = parse_history_cursor(cursor)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        q = q.filter(or_(
+            Record.date_set < cur_date,
+            and_(Record.date_set == cur_date, Record.id < cur_id),
+        ))
 
-    current_recs = (
-        db.session.query(Record)
-        .join(
-            best_per_machine,
-            db.and_(
-                Record.machine_id == best_per_machine.c.machine_id,
-                Record.time_ms == best_per_machine.c.best_ms,
-                Record.course_id == course.id
-            )
-        )
-        .order_by(Record.machine_id.asc())
+    # fetch one extra row to know if there is another page
+    rows = (
+        wr_queries.with_relations(q)
+        .order_by(Record.date_set.desc(), Record.id.desc())
+        .limit(limit + 1)
         .all()
     )
 
-    currentMachineWrs = []
-    for r in current_recs:
-        nation_code = (r.user.country_code or "").lower()
-        currentMachineWrs.append({
-            "machineName": r.machine.name,
-            "machineIcon": f"static/{r.machine.icon}".replace("\\", "/") if not r.machine.icon.startswith("static/") else r.machine.icon,
-            "date": r.date_set.isoformat() if r.date_set else "",
-            "time": r.time_str,
-            "player": r.user.username,
-            "nationCode": nation_code,  # expects lowercase for svg file names
-            "days": days_since(r.date_set),
-            "lap1": r.lap1,
-            "lap2": r.lap2,
-            "lap3": r.lap3,
-            "charIcon": f"static/{r.character.icon}".replace("\\", "/") if not r.character.icon.startswith("static/") else r.character.icon,
-            "charAlt": r.character.name
-        })
-
-    # ----------------------------
-    # History (optional but matches your UI)
-    # newest first
-    # ----------------------------
-    history_q = (
-        Record.query
-        .filter(Record.course_id == course.id)
-        .order_by(Record.date_set.desc(), Record.time_ms.asc())
-        .limit(200)
-        .all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = f"{last.date_set.isoformat()}.{last.id}"
+
+    # rows come from the fragment cache; only the cursor is encoded per request
+    return fragments.object_response(
+        items=fragments.json_list("history", rows, history_row),
+        nextCursor=current_app.json.dumps_bytes(next_cursor),
     )
 
-    history = []
-    for r in history_q:
-        nation_code = (r.user.country_code or "").lower()
-        history.append({
-            "date": r.date_set.isoformat() if r.date_set else "",
-            "machineName": r.machine.name,
-            "machineIcon": f"static/{r.machine.icon}".replace("\\", "/") if not r.machine.icon.startswith("static/") else r.machine.icon,
-            "time": r.time_str,
-            "player": r.user.username,
-            "nationCode": nation_code,
-            "days": days_since(r.date_set),
-            "lap1": r.lap1,
-            "lap2": r.lap2,
-            "lap3": r.lap3,
-            "charIcon": f"static/{r.character.icon}".replace("\\", "/") if not r.character.icon.startswith("static/") else r.character.icon
-        })
-
-    # ----------------------------
-    # Course Stats (based on current machine WRs)
-    # ----------------------------
-    total_days = sum(x["days"] for x in currentMachineWrs) or 1  # avoid divide-by-zero
-
-    # By Player
-    by_player = {}
-    for x in currentMachineWrs:
-        by_player.setdefault(x["player"], 0)
-        by_player[x["player"]] += x["days"]
-    statsByPlayer = [
-        {"player": p, "total": d, "pct": round((d / total_days) * 100, 2)}
-        for p, d in sorted(by_player.items(), key=lambda kv: kv[1], reverse=True)
-    ]
-
-    # By Machine
-    by_machine = {}
-    for x in currentMachineWrs:
-        by_machine.setdefault(x["machineName"], 0)
-        by_machine[x["machineName"]] += x["days"]
-    statsByMachine = [
-        {"machine": m, "total": d, "pct": round((d / total_days) * 100, 2)}
-        for m, d in sorted(by_machine.items(), key=lambda kv: kv[1], reverse=True)
-    ]
-
-    # By Nation (count of current WRs per nation)
-    by_nation = {}
-    for x in currentMachineWrs:
-        code = x["nationCode"] or "??"
-        by_nation.setdefault(code, 0)
-        by_nation[code] += 1
-    statsByNation = [
-        {"nation": n, "count": c}
-        for n, c in sorted(by_nation.items(), key=lambda kv: kv[1], reverse=True)
-    ]
-
-    summary = {
-        "totalMachineWrs": len(currentMachineWrs),
-        "uniquePlayers": len(set(x["player"] for x in currentMachineWrs)),
-        "uniqueNations": len(set(x["nationCode"] for x in currentMachineWrs if x["nationCode"])),
-        "uniqueMachines": len(set(x["machineName"] for x in currentMachineWrs)),
+
+# ----------------------------
+# Leaderboard: /api/course/<course_key>/leaderboard?machine=Warp Star
+# every player's best time on one machine, ranked. Served from the in-memory
+# boards in leaderboard.py, so a rank is a bisect instead of a sort.
+#   ?limit=10&offset=0        page of the ranking (limit capped by LEADERBOARD_MAX_PAGE_SIZE)
+#   ?player=someone&around=5  that player's rank and the N entries either side of it
+#   ?time=1'05"780            the rank that time would get
+# ----------------------------
+def leaderboard_row(rank: int, r: Record):
+    return {
+        "rank": rank,
+        "recordId": r.id,
+        "player": r.user.username,
+        "nationCode": (r.user.country_code or "").lower(),
+        "time": r.time_str,
+        "timeMs": r.time_ms,
+        "date": r.date_set.isoformat() if r.date_set else "",
+        "days": days_since(r.date_set),
+        "charIcon": static_path(r.character.icon),
     }
 
-    # map icon path (your Course.map_icon already looks like images/mapICONS/Name.png)
-    map_icon = ""
-    if course.map_icon:
-        map_icon = course.map_icon.replace("\\", "/")
-        if not map_icon.startswith("static/"):
-            map_icon = f"static/{map_icon}"
-
-    return jsonify({
-        "key": course.course_key,
-        "name": course.name,
-        "mapIcon": map_icon,
-        "currentMachineWrs": currentMachineWrs,
-        "history": history,
-        "summary": summary,
-        "stats": {
-            "byPlayer": statsByPlayer,
-            "byMachine": statsByMachine,
-            "byNation": statsByNation
-        }
-    })
+def _int_arg(name: str, default: int) -> int:
+    return int(request.args.get(name, default))
+
+@bp_courses.get("/api/course/<course_key>/leaderboard")
+@cached_response
+def get_course_leaderboard(course_key):
+    course = Course.query.filter_by(course_key=course_key).first()
+    if not course:
+        return jsonify({"error": "Course not found"}), 404
+
+    machine = Machine.query.filter_by(name=request.args.get("machine", "")).first()
+    if not machine:
+        return jsonify({"error": "Machine not found"}), 404
+
+    max_size = current_app.config.get("LEADERBOARD_MAX_PAGE_SIZE", 100)
+    try:
+        limit = min(max(_int_arg("limit", 10), 1), max_size)
+        offset = max(_int_arg("offset", 0), 0)
+        around = min(max(_int_arg("around", 5), 0), max_size)
+    except ValueError:
+        return jsonify({"error": "limit, offset and around must be numbers"}), 400
+
+    board = leaderboards().board(course.id, machine.id)
+    result = {"course": course.course_key, "machine": machine.name, "total": len(board)}
+
+    time_str = request.args.get("time")
+    if time_str:
+        try:
+            result["rankForTime"] = board.rank_for_time(parse_time_to_ms(time_str))
+        except ValueError:
+            return jsonify({"error": "Invalid time format"}), 400
+
+    player = request.args.get("player")
+    if player:
+        user = User.query.filter_by(username=player).first()
+        rank = board.rank_of_user(user.id) if user else None
+        if rank is None:
+            return jsonify({"error": "Player has no time on this course and machine"}), 404
+        result["playerRank"] = rank
+        page = board.page(rank - 1 - around, 2 * around + 1)
+    else:
+        page = board.page(offset, limit)
+
+    # key[3] is the record id; hydrate the whole page in one query
+    records = {
+        r.id: r for r in
+        wr_queries.with_relations(Record.query.filter(Record.id.in_([key[3] for _, key in page])))
+    }
+    result["items"] = [leaderboard_row(rank, records[key[3]]) for rank, key in page if key[3] in records]
+    return jsonify(result)
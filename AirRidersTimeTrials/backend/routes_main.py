@@ -1,9 +1,20 @@
-from flask import Blueprint, request, jsonify, render_template, redirect, session
-from extensions import db
+from flask import Blueprint, request, jsonify, render_template, redirect, session, current_app
+import stats_service
+from cache import cached_response
 
 
 bp_home = Blueprint('routes', __name__)
 
+# tables shown on the home view right after load; see SSR_INITIAL_STATE
+INITIAL_STATE_SECTIONS = ("countries", "currentWrs", "recentWrs")
+
 @bp_home.route("/", methods=["GET"])
+@cached_response
 def home():
-    return render_template("index.html")
\ No newline at end of file
+    # the rendered page is cached per data version + day like the JSON endpoints,
+    # so the embedded tables cost one aggregation per change, not per visit
+    initial_state = None
+    if current_app.config.get("SSR_INITIAL_STATE", True):
+        initial_state = stats_service.bootstrap(INITIAL_STATE_SECTIONS)
+    live_feed = current_app.config.get("STREAM_ENABLED", False)
+    return render_template("index.html", initial_state=initial_state, live_feed=live_feed)
@@ -0,0 +1,15 @@
+from flask import Blueprint, jsonify
+from models import User
+import stats_service
+from cache import cached_response
+
+bp_players = Blueprint("players", __name__)
+
+@bp_players.get("/api/players/<username>")
+@cached_response
+def get_player(username):
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        return jsonify({"error": "Player not found"}), 404
+
+    return jsonify(stats_service.player_profile(user))
@@ -0,0 +1,50 @@
+import queue
+import time
+
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from events import broker
+
+bp_stream = Blueprint("stream", __name__)
+
+# ----------------------------
+# Live WR feed: /api/stream/wrs (text/event-stream)
+#   event: record   one per submission with isWr set, only sent for WRs unless ?all=1
+#   event: refresh  records were removed; refetch whatever is on screen
+# ----------------------------
+@bp_stream.get("/api/stream/wrs")
+def stream_wrs():
+    cfg = current_app.config
+    if not cfg.get("STREAM_ENABLED", False):
+        return jsonify({"error": "stream disabled"}), 404
+
+    include_all = request.args.get("all") == "1"
+    heartbeat = cfg.get("STREAM_HEARTBEAT_SECONDS", 15)
+    max_seconds = cfg.get("STREAM_MAX_SECONDS", 300)
+
+    broker.ensure_poller(current_app._get_current_object())
+    q = broker.subscribe(cfg.get("STREAM_QUEUE_SIZE", 100))
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            deadline = time.monotonic() + max_seconds
+            while time.monotonic() < deadline:
+                try:
+                    message = q.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    break  # dropped for falling behind; the browser reconnects
+                minor, text = message
+                if minor and not include_all:
+                    continue
+                yield text
+        finally:
+            broker.unsubscribe(q)
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # nginx: don't buffer the stream
+    })
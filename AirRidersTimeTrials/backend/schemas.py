@@ -27,6 +27,20 @@ def parse_time_to_ms(time_str: str) -> int:
 
     return (minutes * 60 * 1000) + (seconds * 1000) + millis
 
+def check_country_code(value):
+    """Empty is fine; otherwise it has to be a code in the countries table (users.country_code is a foreign key)."""
+    if value is None or value == "":
+        return
+    
+    if len(value) != 2:
+        raise ValidationError("Country code must be exactly 2 characters.")
+    
+    lower_case_country_code = value.lower()
+    country_exists = db.session.get(Country, lower_case_country_code)
+
+    if not country_exists:
+        raise ValidationError(f"Invalid country code: {value}")
+
 class RegisterSchema(Schema):
     username = fields.Str(required=True)
     password = fields.Str(required=True, load_only=True)
@@ -46,6 +60,10 @@ class RegisterSchema(Schema):
         if len(value) < 6:
             raise ValidationError("Password must be at least 6 characters.")
 
+    @validates("country_code")
+    def validate_country_code(self, value, **kwargs):
+        check_country_code(value)
+
 
 class UpdateUserSchema(Schema):
     class Meta:
@@ -59,23 +77,7 @@ class UpdateUserSchema(Schema):
 #did **kwargs to def valid country code
     @validates("country_code")
     def validate_country_code(self, value, **kwargs):
-        if value is None or value == "":
-            return
-        
-        if len(value) != 2:
-            raise ValidationError("Country code must be exactly 2 characters.")
-        
-        lower_case_country_code = value.lower()
-        country_exists = db.session.get(Country, lower_case_country_code)
-
-        #checks
-        if country_exists:
-            return
-        
-        print(f"DEBUG: Checking country '{lower_case_country_code}'... Found: {country_exists is not None}")
-
-        if not country_exists:
-            raise ValidationError(f"Invalid country code: {value}")
+        check_country_code(value)
 
 class LoginSchema(Schema):
     username = fields.Str(required=True)
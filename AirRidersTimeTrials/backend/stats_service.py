@@ -0,0 +1,382 @@
+"""
+Leaderboard computations behind the stats and course endpoints.
+
+Every hot read endpoint has exactly one implementation, here. The route
+modules only parse the request, call one of these and jsonify the result.
+"""
+from datetime import date, timedelta
+from collections import defaultdict
+from functools import lru_cache
+
+from sqlalchemy import and_
+from sqlalchemy.orm import aliased
+
+from extensions import db
+from models import User, Record, Country, Course, Machine, CurrentWR, WrReign, PersonalBest
+import wr_index
+import wr_queries
+import assets
+
+
+RECENT_WRS_MAX_DAYS = 36_500  # a century back: every WR there is
+
+
+# ---------- helpers ----------
+def days_since(d: date) -> int:
+    if not d:
+        return 0
+    return max((date.today() - d).days, 0)
+
+
+@lru_cache(maxsize=2048)
+def static_path(p: str) -> str:
+    """
+    Your DB stores paths like: "images/mapICONS/Floria_Fields.png"
+    Frontend expects: "static/images/..." (the fingerprinted copy after `flask build-assets`)
+    """
+    if not p:
+        return ""
+    return assets.asset_url(p)
+
+
+def record_to_course_machine_row(r: Record):
+    return {
+        "course_key": r.course.course_key,
+        "course_name": r.course.name,
+        "machine_name": r.machine.name,
+        "machine_icon": static_path(r.machine.icon),
+        "time": r.time_str,
+        "player": r.user.username,
+        "nation_code": (r.user.country_code or "us").lower(),
+        "date": r.date_set.isoformat() if r.date_set else None,
+        "days": days_since(r.date_set),
+        "character_name": r.character.name,
+        "char_icon": static_path(r.character.icon),
+    }
+
+
+def record_to_course_page_row(r: Record):
+    return {
+        "machineName": r.machine.name,
+        "machineIcon": static_path(r.machine.icon),
+        "date": r.date_set.isoformat() if r.date_set else "",
+        "time": r.time_str,
+        "player": r.user.username,
+        "nationCode": (r.user.country_code or "").lower(),  # expects lowercase for svg file names
+        "days": days_since(r.date_set),
+        "lap1": r.lap1,
+        "lap2": r.lap2,
+        "lap3": r.lap3,
+        "charIcon": static_path(r.character.icon),
+        "charAlt": r.character.name
+    }
+
+
+# ---------- core: find CURRENT WR per (course, machine) ----------
+def get_current_wr_by_course_machine(since: date = None):
+    """
+    Returns dict keyed by (course_id, machine_id) -> Record
+    Reads the materialized current_wrs table (see wr_index.py),
+    optionally only WRs set on/after `since`.
+    """
+    q = wr_queries.current_wrs(since=since)
+    return {(r.course_id, r.machine_id): r for r in q.all()}
+
+
+# ---------- core: compute WR HOLD DURATIONS properly ----------
+def compute_wr_days_by_user():
+    """
+    Timeline-based WR days per user, read from the wr_reigns table
+    (one row per time a record became the new best for its course+machine,
+    maintained by wr_index.py). Cost grows with the number of WR reigns,
+    not with the number of submitted records.
+    """
+    return wr_index.reign_totals(date.today())
+
+
+# =========================
+#   best time per COURSE
+# =========================
+def current_wr_rows(current=None):
+    """current: the (course, machine) WR records, when the caller already loaded them."""
+    # best of the (course, machine) WRs per course (across machines), one row per course
+    if current is None:
+        best = wr_queries.best_per_course().all()
+    else:
+        by_course = {}
+        for r in current:
+            if r.course_id not in by_course or wr_index.wr_sort_key(r) < wr_index.wr_sort_key(by_course[r.course_id]):
+                by_course[r.course_id] = r
+        best = by_course.values()
+    out = [record_to_course_machine_row(r) for r in best]
+    # keep stable ordering by course name
+    out.sort(key=lambda x: x["course_name"].lower())
+    return out
+
+
+# =========================
+#   best time per (COURSE, MACHINE)
+# =========================
+def wr_snapshot_records(current=None):
+    """The WR records in snapshot order: by course then machine."""
+    if current is None:
+        current = get_current_wr_by_course_machine().values()
+    return sorted(current, key=lambda r: (r.course.name.lower(), r.machine.name.lower()))
+
+def wr_snapshot_rows(current=None):
+    return [record_to_course_machine_row(r) for r in wr_snapshot_records(current)]
+
+
+# =========================
+#   current WRs set within last N days
+# =========================
+def recent_wr_rows(days: int = 5, current=None):
+    # ?days= comes straight from the query string; timedelta overflows past ~2.7M days
+    days = min(max(days, 0), RECENT_WRS_MAX_DAYS)
+    cutoff = date.today() - timedelta(days=days)
+
+    if current is None:
+        current = get_current_wr_by_course_machine(since=cutoff).values()
+    else:
+        current = [r for r in current if r.date_set >= cutoff]
+    rows = [record_to_course_machine_row(r) for r in current]
+
+    # newest first; same-day WRs by course then machine so the order is stable
+    rows.sort(key=lambda x: (x["course_name"].lower(), x["machine_name"].lower()))
+    rows.sort(key=lambda x: x["date"], reverse=True)
+    return rows
+
+
+# =========================
+#   rank by WR count + total WR days (timeline based)
+# =========================
+def player_ranking_rows():
+    totals_days, wr_counts, _ = compute_wr_days_by_user()
+
+    users = db.session.query(User.id, User.username, User.country_code).all()
+    rows = []
+    for user_id, username, country_code in users:
+        rows.append({
+            "player": username,
+            "nation_code": (country_code or "us").lower(),
+            "wr_count": int(wr_counts.get(user_id, 0)),
+            "total_wr_days": int(totals_days.get(user_id, 0)),
+        })
+
+    # sort: WR count desc, then WR days desc, then name
+    rows.sort(key=lambda r: (-r["wr_count"], -r["total_wr_days"], r["player"].lower()))
+
+    # assign ranks (1..n)
+    for i, r in enumerate(rows, start=1):
+        r["rank"] = i
+
+    return rows
+
+
+# =========================
+#   rank by total WR count + unique players
+# =========================
+def country_ranking_rows(current=None):
+    if current is None:
+        current = get_current_wr_by_course_machine().values()
+
+    wr_count_by_country = defaultdict(int)
+    players_by_country = defaultdict(set)
+
+    for r in current:
+        code = (r.user.country_code or "us").lower()
+        wr_count_by_country[code] += 1
+        players_by_country[code].add(r.user_id)
+
+    rows = []
+    for code, count in wr_count_by_country.items():
+        rows.append({
+            "nation_code": code,
+            "wr_count": int(count),
+            "unique_players": int(len(players_by_country.get(code, set()))),
+        })
+
+    # sort: WR count desc, then unique players desc, then code
+    rows.sort(key=lambda r: (-r["wr_count"], -r["unique_players"], r["nation_code"]))
+
+    for i, r in enumerate(rows, start=1):
+        r["rank"] = i
+
+    return rows
+
+
+# =========================
+#   home page bootstrap: every stats table from ONE load of the current WRs
+# =========================
+BOOTSTRAP_SECTIONS = ("countries", "currentWrs", "wrSnapshot", "recentWrs", "playerRankings", "countryRankings")
+
+def bootstrap(sections=BOOTSTRAP_SECTIONS, recent_days: int = 5):
+    """
+    The same rows /api/countries, /api/current-wrs, /api/wr-snapshot, /api/recent-wrs,
+    /api/rankings/players and /api/rankings/countries return, keyed by section name.
+    The current_wrs set is read once and every WR table is derived from it.
+    """
+    out = {}
+    current = None
+    if {"currentWrs", "wrSnapshot", "recentWrs", "countryRankings"} & set(sections):
+        current = list(get_current_wr_by_course_machine().values())
+
+    if "countries" in sections:
+        # sorted in Python like /api/countries (collation independent)
+        out["countries"] = [{"code": c.code, "name": c.name} for c in sorted(Country.query.all(), key=lambda c: c.name)]
+    if "currentWrs" in sections:
+        out["currentWrs"] = current_wr_rows(current)
+    if "wrSnapshot" in sections:
+        out["wrSnapshot"] = wr_snapshot_rows(current)
+    if "recentWrs" in sections:
+        out["recentWrs"] = recent_wr_rows(recent_days, current)
+    if "playerRankings" in sections:
+        out["playerRankings"] = player_ranking_rows()
+    if "countryRankings" in sections:
+        out["countryRankings"] = country_ranking_rows(current)
+    return out
+
+
+# =========================
+#   course page: current WR per machine + course stats
+# =========================
+def course_page(course):
+    current_recs = (
+        wr_queries.current_wrs(course_id=course.id)
+        .order_by(Record.machine_id.asc())
+        .all()
+    )
+    currentMachineWrs = [record_to_course_page_row(r) for r in current_recs]
+
+    # ----------------------------
+    # Course Stats (based on current machine WRs)
+    # ----------------------------
+    total_days = sum(x["days"] for x in currentMachineWrs) or 1  # avoid divide-by-zero
+
+    # By Player
+    by_player = {}
+    for x in currentMachineWrs:
+        by_player.setdefault(x["player"], 0)
+        by_player[x["player"]] += x["days"]
+    statsByPlayer = [
+        {"player": p, "total": d, "pct": round((d / total_days) * 100, 2)}
+        for p, d in sorted(by_player.items(), key=lambda kv: kv[1], reverse=True)
+    ]
+
+    # By Machine
+    by_machine = {}
+    for x in currentMachineWrs:
+        by_machine.setdefault(x["machineName"], 0)
+        by_machine[x["machineName"]] += x["days"]
+    statsByMachine = [
+        {"machine": m, "total": d, "pct": round((d / total_days) * 100, 2)}
+        for m, d in sorted(by_machine.items(), key=lambda kv: kv[1], reverse=True)
+    ]
+
+    # By Nation (count of current WRs per nation)
+    by_nation = {}
+    for x in currentMachineWrs:
+        code = x["nationCode"] or "??"
+        by_nation.setdefault(code, 0)
+        by_nation[code] += 1
+    statsByNation = [
+        {"nation": n, "count": c}
+        for n, c in sorted(by_nation.items(), key=lambda kv: kv[1], reverse=True)
+    ]
+
+    summary = {
+        "totalMachineWrs": len(currentMachineWrs),
+        "uniquePlayers": len(set(x["player"] for x in currentMachineWrs)),
+        "uniqueNations": len(set(x["nationCode"] for x in currentMachineWrs if x["nationCode"])),
+        "uniqueMachines": len(set(x["machineName"] for x in currentMachineWrs)),
+    }
+
+    return {
+        "key": course.course_key,
+        "name": course.name,
+        "mapIcon": static_path(course.map_icon),
+        "currentMachineWrs": currentMachineWrs,
+        "summary": summary,
+        "stats": {
+            "byPlayer": statsByPlayer,
+            "byMachine": statsByMachine,
+            "byNation": statsByNation
+        }
+    }
+
+
+# =========================
+#   player profile: personal bests, gap to the current WR, current reigns
+# =========================
+def player_profile(user: User):
+    """
+    One indexed read: personal_bests for the user (primary key prefix), each
+    joined to its record, the pair's current WR (+ holder) and, when the user
+    holds that WR, the open reign it started.
+    """
+    holder = aliased(User)
+    rows = (
+        db.session.query(
+            Course.course_key, Course.name, Machine.name, Machine.icon,
+            Record.time_str, PersonalBest.record_id, PersonalBest.time_ms, PersonalBest.date_set,
+            CurrentWR.record_id, CurrentWR.time_ms, holder.username, holder.country_code,
+            WrReign.start_date,
+        )
+        .join(Record, Record.id == PersonalBest.record_id)
+        .join(Course, Course.id == PersonalBest.course_id)
+        .join(Machine, Machine.id == PersonalBest.machine_id)
+        .outerjoin(CurrentWR, and_(
+            CurrentWR.course_id == PersonalBest.course_id, CurrentWR.machine_id == PersonalBest.machine_id,
+        ))
+        .outerjoin(holder, holder.id == CurrentWR.user_id)
+        .outerjoin(WrReign, and_(
+            WrReign.course_id == PersonalBest.course_id, WrReign.machine_id == PersonalBest.machine_id,
+            WrReign.user_id == PersonalBest.user_id, WrReign.end_date.is_(None),
+        ))
+        .filter(PersonalBest.user_id == user.id)
+        .order_by(PersonalBest.course_id, PersonalBest.machine_id)
+        .all()
+    )
+
+    personal_bests = []
+    current_reigns = []
+    for (course_key, course_name, machine_name, machine_icon, time_str, record_id, time_ms, date_set,
+         wr_record_id, wr_time_ms, wr_player, wr_country, reign_start) in rows:
+        is_wr = wr_record_id == record_id
+        gap_ms = time_ms - wr_time_ms if wr_time_ms is not None else 0
+        personal_bests.append({
+            "courseKey": course_key,
+            "courseName": course_name,
+            "machineName": machine_name,
+            "machineIcon": static_path(machine_icon),
+            "time": time_str,
+            "timeMs": time_ms,
+            "date": date_set.isoformat() if date_set else "",
+            "days": days_since(date_set),
+            "isWr": is_wr,
+            "wrTimeMs": wr_time_ms,
+            "wrPlayer": wr_player,
+            "wrNationCode": (wr_country or "").lower(),
+            "gapMs": gap_ms,
+            "gapPercent": round(100.0 * gap_ms / wr_time_ms, 2) if wr_time_ms else 0.0,
+        })
+        if is_wr:
+            since = reign_start or date_set
+            current_reigns.append({
+                "courseKey": course_key,
+                "courseName": course_name,
+                "machineName": machine_name,
+                "machineIcon": static_path(machine_icon),
+                "time": time_str,
+                "since": since.isoformat() if since else "",
+                "days": days_since(since),
+            })
+
+    return {
+        "player": user.username,
+        "nationCode": (user.country_code or "").lower(),
+        "pbCount": len(personal_bests),
+        "wrCount": len(current_reigns),
+        "personalBests": personal_bests,
+        "currentReigns": current_reigns,
+    }
@@ -0,0 +1,262 @@
+from collections import defaultdict
+
+from sqlalchemy import insert, tuple_
+
+from extensions import db
+from models import Record, CurrentWR, WrReign, PersonalBest
+from wr_queries import best_per_course_machine, personal_best_columns
+
+
+# -------------------- HELPERS --------------------
+def wr_sort_key(rec: Record):
+    """
+    Ordering used to decide which record is "the" WR.
+    Lowest time wins; ties go to the earliest date_set, then created_at, then id.
+    """
+    return (rec.time_ms, rec.date_set, rec.created_at, rec.id)
+
+def _set_current(row: CurrentWR, rec: Record):
+    row.record_id = rec.id
+    row.user_id = rec.user_id
+    row.time_ms = rec.time_ms
+    row.date_set = rec.date_set
+
+def _pair_filter(pairs):
+    return tuple_(Record.course_id, Record.machine_id).in_(pairs)
+
+def _replay_reigns(rows):
+    """
+    rows: (course_id, machine_id, user_id, record_id, time_ms, date_set) in
+    chronological order (date_set, created_at, id) for each pair.
+    A record starts a new reign only if it beats the best time so far;
+    the previous reign ends on the day the new one starts.
+    """
+    reigns = []
+    last_by_pair = {}
+
+    for course_id, machine_id, user_id, record_id, time_ms, date_set in rows:
+        pair = (course_id, machine_id)
+        prev = last_by_pair.get(pair)
+        if prev is not None and time_ms >= prev.time_ms:
+            continue
+
+        if prev is not None:
+            prev.end_date = date_set
+
+        reign = WrReign(
+            course_id=course_id, machine_id=machine_id, user_id=user_id,
+            record_id=record_id, time_ms=time_ms, start_date=date_set, end_date=None,
+        )
+        reigns.append(reign)
+        last_by_pair[pair] = reign
+
+    return reigns
+
+def _timeline_rows(*filters):
+    return (
+        db.session.query(
+            Record.course_id, Record.machine_id, Record.user_id,
+            Record.id, Record.time_ms, Record.date_set,
+        )
+        .filter(*filters)
+        .order_by(Record.course_id, Record.machine_id, Record.date_set.asc(), Record.created_at.asc(), Record.id.asc())
+    )
+
+
+# -------------------- WRITE HOOKS --------------------
+def on_record_created(rec: Record) -> bool:
+    """
+    Call after the new record has been flushed (so it has an id), before commit.
+    Updates current_wrs, wr_reigns and personal_bests.
+    Returns True if the record is now the current WR for its (course, machine).
+    """
+    _extend_reigns(rec)
+    _update_personal_best(rec)
+
+    row = db.session.get(CurrentWR, (rec.course_id, rec.machine_id))
+    if row is None:
+        row = CurrentWR(course_id=rec.course_id, machine_id=rec.machine_id)
+        _set_current(row, rec)
+        db.session.add(row)
+        return True
+
+    if wr_sort_key(rec) < wr_sort_key(row.record):
+        _set_current(row, rec)
+        return True
+
+    return False
+
+def _extend_reigns(rec: Record):
+    """
+    New submissions are dated today, i.e. they are the latest point on the
+    timeline, so only the open reign for the pair needs looking at.
+    """
+    open_reign = (
+        WrReign.query
+        .filter_by(course_id=rec.course_id, machine_id=rec.machine_id, end_date=None)
+        .first()
+    )
+    if open_reign is not None and rec.time_ms >= open_reign.time_ms:
+        return
+
+    if open_reign is not None:
+        open_reign.end_date = rec.date_set
+
+    db.session.add(WrReign(
+        course_id=rec.course_id, machine_id=rec.machine_id, user_id=rec.user_id,
+        record_id=rec.id, time_ms=rec.time_ms, start_date=rec.date_set, end_date=None,
+    ))
+
+def _update_personal_best(rec: Record):
+    """Same reasoning as _extend_reigns: a new submission only wins a tie-free improvement."""
+    pb = db.session.get(PersonalBest, (rec.user_id, rec.course_id, rec.machine_id))
+    if pb is None:
+        pb = PersonalBest(user_id=rec.user_id, course_id=rec.course_id, machine_id=rec.machine_id)
+        db.session.add(pb)
+    elif rec.time_ms >= pb.time_ms:
+        return
+
+    pb.record_id = rec.id
+    pb.time_ms = rec.time_ms
+    pb.date_set = rec.date_set
+
+def forget_user(user_id: int):
+    """
+    Call BEFORE deleting a user. Drops the current_wrs rows and every reign of
+    the (course, machine) pairs where they ever held the WR (their records are
+    about to disappear) and returns those pairs so they can be recomputed once
+    the delete has been flushed. Records that never were a WR don't change the
+    timeline, so other pairs are left alone.
+    """
+    # only their own personal bests point at their records
+    PersonalBest.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+    pairs = set()
+    for r in CurrentWR.query.filter_by(user_id=user_id).all():
+        pairs.add((r.course_id, r.machine_id))
+        db.session.delete(r)
+
+    for course_id, machine_id in db.session.query(WrReign.course_id, WrReign.machine_id).filter_by(user_id=user_id).distinct():
+        pairs.add((course_id, machine_id))
+
+    if pairs:
+        WrReign.query.filter(
+            tuple_(WrReign.course_id, WrReign.machine_id).in_(list(pairs))
+        ).delete(synchronize_session=False)
+
+    db.session.flush()
+    return sorted(pairs)
+
+def recompute_pairs(pairs):
+    """Recalculate the current WR and the reign timeline for the given (course_id, machine_id) pairs."""
+    pairs = list(pairs)
+    if not pairs:
+        return
+
+    best = {
+        (r.course_id, r.machine_id): r
+        for r in best_per_course_machine(_pair_filter(pairs))
+    }
+
+    for course_id, machine_id in pairs:
+        row = db.session.get(CurrentWR, (course_id, machine_id))
+        rec = best.get((course_id, machine_id))
+
+        if rec is None:
+            if row is not None:
+                db.session.delete(row)
+            continue
+
+        if row is None:
+            row = CurrentWR(course_id=course_id, machine_id=machine_id)
+            db.session.add(row)
+        _set_current(row, rec)
+
+    WrReign.query.filter(
+        tuple_(WrReign.course_id, WrReign.machine_id).in_(pairs)
+    ).delete(synchronize_session=False)
+    db.session.add_all(_replay_reigns(_timeline_rows(_pair_filter(pairs))))
+
+
+# -------------------- REBUILD --------------------
+def rebuild_current_wrs() -> int:
+    """
+    Throws away current_wrs and recomputes it from the records table.
+    Used for backfilling existing databases and by `flask rebuild-wrs`.
+    Returns the number of (course, machine) WRs written.
+    """
+    CurrentWR.query.delete()
+
+    count = 0
+    for rec in best_per_course_machine():
+        row = CurrentWR(course_id=rec.course_id, machine_id=rec.machine_id)
+        _set_current(row, rec)
+        db.session.add(row)
+        count += 1
+
+    db.session.commit()
+    return count
+
+def rebuild_wr_reigns() -> int:
+    """
+    Replays every (course, machine) history into wr_reigns.
+    Only plain columns are read, never Record objects. Returns the number of reigns.
+    """
+    WrReign.query.delete()
+    reigns = _replay_reigns(_timeline_rows())
+    db.session.add_all(reigns)
+    db.session.commit()
+    return len(reigns)
+
+def rebuild_personal_bests() -> int:
+    """Recomputes personal_bests from the records table in one INSERT ... SELECT. Returns the number of rows."""
+    PersonalBest.query.delete()
+    best = personal_best_columns().subquery()
+    db.session.execute(insert(PersonalBest).from_select(
+        ["course_id", "machine_id", "user_id", "record_id", "time_ms", "date_set"],
+        db.session.query(best.c.course_id, best.c.machine_id, best.c.user_id, best.c.record_id, best.c.time_ms, best.c.date_set),
+    ))
+    db.session.commit()
+    return PersonalBest.query.count()
+
+def ensure_wr_tables():
+    """Backfills current_wrs / wr_reigns / personal_bests for databases created before the tables existed."""
+    if Record.query.first() is None:
+        return
+
+    if CurrentWR.query.first() is None:
+        count = rebuild_current_wrs()
+        print(f"current_wrs backfilled: {count} WRs.")
+
+    if WrReign.query.first() is None:
+        count = rebuild_wr_reigns()
+        print(f"wr_reigns backfilled: {count} reigns.")
+
+    if PersonalBest.query.first() is None:
+        count = rebuild_personal_bests()
+        print(f"personal_bests backfilled: {count} rows.")
+
+
+# -------------------- READS --------------------
+def reign_totals(today):
+    """
+    Per-user totals from wr_reigns, O(number of reigns):
+      totals[user_id]    -> days holding WRs (open reigns count up to `today`)
+      wr_counts[user_id] -> number of times they set a WR
+      wr_pairs[user_id]  -> set of (course_id, machine_id) they held at least once
+    """
+    totals = defaultdict(int)
+    wr_counts = defaultdict(int)
+    wr_pairs = defaultdict(set)
+
+    rows = db.session.query(
+        WrReign.user_id, WrReign.course_id, WrReign.machine_id, WrReign.start_date, WrReign.end_date
+    )
+    for user_id, course_id, machine_id, start, end in rows:
+        wr_counts[user_id] += 1
+        wr_pairs[user_id].add((course_id, machine_id))
+        duration = ((end or today) - start).days
+        if duration > 0:
+            totals[user_id] += duration
+
+    return totals, wr_counts, wr_pairs
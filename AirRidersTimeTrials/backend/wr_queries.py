@@ -0,0 +1,97 @@
+"""
+Shared "best record per group" queries.
+
+Everything that needs "the WR" for some grouping goes through here so the
+tie-break is the same everywhere and is done by SQLite, not in Python:
+    lowest time_ms, then earliest date_set, then created_at, then id
+
+ROW_NUMBER() OVER (PARTITION BY ... ORDER BY ...) returns exactly one row per
+group, so only as many rows as there are groups ever leave the database.
+"""
+from sqlalchemy import func, and_
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models import Record, CurrentWR
+
+
+def with_relations(q):
+    """
+    Eager-loads everything the row serializers touch (user, course, machine, character)
+    in the same SELECT, so building N rows never triggers N lazy loads.
+    """
+    return q.options(
+        joinedload(Record.user, innerjoin=True),
+        joinedload(Record.course, innerjoin=True),
+        joinedload(Record.machine, innerjoin=True),
+        joinedload(Record.character, innerjoin=True),
+    )
+
+
+def wr_order():
+    return (Record.time_ms.asc(), Record.date_set.asc(), Record.created_at.asc(), Record.id.asc())
+
+
+def _ranked(partition_by, filters, current_only: bool):
+    """Subquery of (record_id, rn) with rn = 1 for the best record of each partition."""
+    rn = func.row_number().over(partition_by=partition_by, order_by=wr_order()).label("rn")
+    q = db.session.query(Record.id.label("record_id"), rn)
+    if current_only:
+        q = q.join(CurrentWR, CurrentWR.record_id == Record.id)
+    return q.filter(*filters).subquery()
+
+
+def best_records(partition_by, *filters, current_only: bool = False):
+    """
+    Query of Record rows, one per partition (e.g. [Record.course_id, Record.machine_id]).
+    With current_only=True the window only looks at rows already in current_wrs,
+    which is how per-course bests are derived without touching the full history.
+    """
+    ranked = _ranked(partition_by, filters, current_only)
+    return with_relations(
+        db.session.query(Record)
+        .join(ranked, and_(Record.id == ranked.c.record_id, ranked.c.rn == 1))
+    )
+
+
+def personal_best_columns(*filters):
+    """
+    (course_id, machine_id, user_id, record_id, time_ms, date_set, created_at) of every
+    player's best record per (course, machine). Plain columns, no Record objects.
+    """
+    rn = func.row_number().over(
+        partition_by=[Record.course_id, Record.machine_id, Record.user_id], order_by=wr_order()
+    ).label("rn")
+    ranked = (
+        db.session.query(
+            Record.course_id, Record.machine_id, Record.user_id, Record.id.label("record_id"),
+            Record.time_ms, Record.date_set, Record.created_at, rn,
+        )
+        .filter(*filters)
+        .subquery()
+    )
+    return db.session.query(
+        ranked.c.course_id, ranked.c.machine_id, ranked.c.user_id, ranked.c.record_id,
+        ranked.c.time_ms, ranked.c.date_set, ranked.c.created_at,
+    ).filter(ranked.c.rn == 1)
+
+
+# -------------------- READ HELPERS USED BY THE ROUTES --------------------
+def best_per_course_machine(*filters):
+    """WR per (course, machine) computed from the records table (rebuilds / recomputes)."""
+    return best_records([Record.course_id, Record.machine_id], *filters)
+
+
+def best_per_course():
+    """WR per course across all machines (home "Current WRs" table)."""
+    return best_records([Record.course_id], current_only=True)
+
+
+def current_wrs(course_id: int = None, since=None):
+    """Current WR per (course, machine) straight from the current_wrs table."""
+    q = with_relations(db.session.query(Record).join(CurrentWR, CurrentWR.record_id == Record.id))
+    if course_id is not None:
+        q = q.filter(CurrentWR.course_id == course_id)
+    if since is not None:
+        q = q.filter(CurrentWR.date_set >= since)
+    return q
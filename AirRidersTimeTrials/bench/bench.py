@@ -0,0 +1,726 @@
+"""
+Endpoint benchmarks.
+
+    python bench/bench.py build --sizes 10k,100k,1m        # generate bench/data/records-<size>.db once
+    python bench/bench.py run --sizes 10k,100k --out bench/reports/mine.json
+    python bench/bench.py http --url http://127.0.0.1:8000 --concurrency 8 --out bench/reports/http.json
+    python bench/bench.py compare bench/reports/main.json bench/reports/mine.json
+
+`run` drives every API route through the Flask test client against a copy of
+each database (one subprocess per size so peak RSS is per size), `http` hammers
+the GET routes of an already running server from several threads.
+Both write the same JSON layout, so any two reports can be compared; `compare`
+exits with status 1 when a route got slower than --threshold or runs more SQL.
+"""
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import click
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+sys.path.insert(0, os.path.join(PROJECT_DIR, "backend"))
+
+DEFAULT_SIZES = "10k,100k"
+BENCH_PASSWORD = "bench-password-1"
+SLOW_ROUTE_ITERATIONS = 5   # register/login hash passwords on purpose; don't spend minutes on them
+NOT_BENCHMARKED = {"GET /api/stream/wrs"}  # long-lived event stream; request latency means nothing there
+
+# tiny valid PNG used as the proof upload
+PNG_1X1 = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01"
+    b"\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\x0bIDATx\x9cc``\x00\x00\x00\x02"
+    b"\x00\x01\xe2!\xbc3\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+
+
+# ---------- helpers ----------
+def parse_size(label: str) -> int:
+    """'10k' -> 10000, '1m' -> 1000000, '2500' -> 2500"""
+    label = label.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(label[-1:], 1)
+    return int(float(label.rstrip("km")) * mult)
+
+def db_path(label: str) -> str:
+    return os.path.join(DATA_DIR, f"records-{label}.db")
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(k, len(sorted_values) - 1)]
+
+def summarize(latencies_ms, sql_counts, statuses):
+    lat = sorted(latencies_ms)
+    return {
+        "n": len(lat),
+        "p50_ms": round(percentile(lat, 50), 3),
+        "p95_ms": round(percentile(lat, 95), 3),
+        "p99_ms": round(percentile(lat, 99), 3),
+        "mean_ms": round(sum(lat) / len(lat), 3) if lat else 0.0,
+        "sql_queries": max(sql_counts) if sql_counts else None,
+        "statuses": sorted(set(statuses)),
+    }
+
+def peak_rss_kb() -> int:
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def meta(mode: str, **options):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "mode": mode,
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "options": options,
+    }
+
+def write_report(report, out):
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Report written to {out}")
+
+def sqlite_url(path: str) -> str:
+    return "sqlite:///" + path
+
+def make_app(database_url: str, upload_folder: str, cache: bool):
+    import app as appmod
+    return appmod, appmod.create_app({
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "UPLOAD_FOLDER": upload_folder,
+        "RESPONSE_CACHE_ENABLED": cache,
+        "SQL_COUNT_HEADER": True,
+        "JWT_SECRET_KEY": "bench-secret-" + "x" * 32,
+    })
+
+
+# ---------- in-process routes ----------
+def bench_routes(app):
+    """
+    (name, iterations cap, request factory) for every API route.
+    Factories return test-client kwargs; the write routes keep a little state
+    (tokens of the users they created) so they can run repeatedly.
+    """
+    from flask_jwt_extended import create_access_token
+    from models import Course, Machine, Character, CurrentWR, Record
+
+    with app.app_context():
+        course = Course.query.order_by(Course.id).first()
+        machine = Machine.query.order_by(Machine.id).first()
+        character = Character.query.order_by(Character.id).first()
+        holder = CurrentWR.query.order_by(CurrentWR.user_id).first()
+        history = Record.query.filter_by(course_id=course.id).order_by(Record.date_set, Record.id)
+        middle = history.offset(history.count() // 2).first()
+        holder_token = create_access_token(identity=str(holder.user_id)) if holder else None
+        holder_name = holder.record.user.username if holder else ""
+        mid_cursor = f"{middle.date_set.isoformat()}.{middle.id}" if middle else ""
+        key, machine_name, character_name = course.course_key, machine.name, character.name
+        board = f"/api/course/{key}/leaderboard?machine={quote(machine_name)}"
+
+    auth = {"Authorization": f"Bearer {holder_token}"}
+    registered = []
+    counter = {"n": 0}
+
+    def register():
+        counter["n"] += 1
+        return {"json": {"username": f"bench_{os.getpid()}_{counter['n']}", "password": BENCH_PASSWORD, "country_code": "us"}}
+
+    def post_record():
+        return {
+            "headers": auth,
+            "data": {
+                "course_key": key,
+                "machine_name": machine_name,
+                "character_name": character_name,
+                "time": "9'59\"999",   # never a WR, so the stored WRs stay put
+                "proof": (io.BytesIO(PNG_1X1), "bench.png"),
+            },
+            "content_type": "multipart/form-data",
+        }
+
+    def throwaway_token():
+        """A fresh user with no records (made outside the timed request), so deleting it leaves the dataset alone."""
+        from extensions import db
+        from models import User
+
+        counter["n"] += 1
+        with app.app_context():
+            user = User(username=f"bench_del_{os.getpid()}_{counter['n']}", password_hash="-", country_code="us")
+            db.session.add(user)
+            db.session.commit()
+            return create_access_token(identity=str(user.id))
+
+    def delete_me():
+        # only ever users the benchmark created; deleting a real WR holder would change the data mid-run
+        token = registered.pop() if registered else throwaway_token()
+        return {"headers": {"Authorization": f"Bearer {token}"}}
+
+    # name (URL rule, stable across datasets) -> concrete path
+    routes = [
+        ("GET /", "/", None, lambda: {}),
+        ("GET /api/current-wrs", "/api/current-wrs", None, lambda: {}),
+        ("GET /api/wr-snapshot", "/api/wr-snapshot", None, lambda: {}),
+        ("GET /api/recent-wrs?days=30", "/api/recent-wrs?days=30", None, lambda: {}),
+        ("GET /api/rankings/players", "/api/rankings/players", None, lambda: {}),
+        ("GET /api/rankings/countries", "/api/rankings/countries", None, lambda: {}),
+        ("GET /api/countries", "/api/countries", None, lambda: {}),
+        ("GET /api/bootstrap", "/api/bootstrap", None, lambda: {}),
+        ("GET /api/course/<course_key>", f"/api/course/{key}", None, lambda: {}),
+        ("GET /api/course/<course_key>/history", f"/api/course/{key}/history", None, lambda: {}),
+        ("GET /api/course/<course_key>/history?cursor=<middle>", f"/api/course/{key}/history?cursor={mid_cursor}", None, lambda: {}),
+        ("GET /api/course/<course_key>/leaderboard", board, None, lambda: {}),
+        ("GET /api/course/<course_key>/leaderboard?time=<t>", board + "&time=1'00\"000", None, lambda: {}),
+        ("GET /api/players/<username>", f"/api/players/{quote(holder_name)}", None, lambda: {}),
+        ("GET /api/me", "/api/me", None, lambda: {"headers": auth}),
+        ("PATCH /api/me", "/api/me", None, lambda: {"headers": auth, "json": {"country_code": "jp"}}),
+        ("POST /api/records", "/api/records", None, post_record),
+        ("POST /api/register", "/api/register", SLOW_ROUTE_ITERATIONS, register),
+        ("POST /api/login", "/api/login", SLOW_ROUTE_ITERATIONS, lambda: {"json": {"username": f"bench_{os.getpid()}_1", "password": BENCH_PASSWORD}}),
+        ("DELETE /api/me", "/api/me", SLOW_ROUTE_ITERATIONS, delete_me),
+    ]
+    return routes, registered
+
+def unbenchmarked_routes(app, routes):
+    """API rules the route list above doesn't exercise (so new endpoints don't slip through)."""
+    covered = {name.split("?", 1)[0] for name, _, _, _ in routes} | NOT_BENCHMARKED
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if not rule.rule.startswith("/api/"):
+            continue
+        for method in rule.methods - {"HEAD", "OPTIONS"}:
+            if f"{method} {rule.rule}" not in covered:
+                missing.append(f"{method} {rule.rule}")
+    return sorted(missing)
+
+def run_size(label: str, iterations: int, cache: bool, out: str, database_url: str = None):
+    """database_url: benchmark that database in place (built with `build --database-url`) instead of a copy of bench/data."""
+    src = db_path(label)
+    if not database_url and not os.path.exists(src):
+        raise click.ClickException(f"{src} missing; run `python bench/bench.py build --sizes {label}` first.")
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        if database_url is None:
+            work_db = os.path.join(tmp, "work.db")
+            shutil.copy(src, work_db)
+            database_url = sqlite_url(work_db)
+        appmod, app = make_app(database_url, os.path.join(tmp, "uploads"), cache)
+
+        from models import Record, User
+        with app.app_context():
+            # datasets built by older commits: add new tables/indexes before timing anything
+            appmod.init_db()
+            records = Record.query.count()
+            users = User.query.count()
+
+        routes, registered = bench_routes(app)
+        client = app.test_client()
+        results = {}
+
+        for name, path, cap, factory in routes:
+            method = name.split(" ", 1)[0]
+            n = min(iterations, cap) if cap else iterations
+            if method == "GET":
+                client.open(path, method=method, **factory())  # warm up, not counted
+
+            latencies, sql_counts, statuses = [], [], []
+            for _ in range(n):
+                kwargs = factory()
+                start = time.perf_counter()
+                resp = client.open(path, method=method, **kwargs)
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses.append(resp.status_code)
+                if resp.headers.get("X-SQL-Queries"):
+                    sql_counts.append(int(resp.headers["X-SQL-Queries"]))
+                if name == "POST /api/register" and resp.status_code == 201:
+                    registered.append(resp.get_json()["access_token"])
+
+            results[name] = summarize(latencies, sql_counts, statuses)
+            results[name]["peak_rss_kb"] = peak_rss_kb()
+            r = results[name]
+            print(f"  [{label}] {name:<60} p50 {r['p50_ms']:>9.2f}ms  p95 {r['p95_ms']:>9.2f}ms  sql {r['sql_queries']}")
+
+        report = {
+            "records": records,
+            "users": users,
+            "peak_rss_kb": peak_rss_kb(),
+            "routes": results,
+            "unbenchmarked": unbenchmarked_routes(app, routes),
+        }
+
+    with open(out, "w") as f:
+        json.dump(report, f)
+
+
+# ---------- http routes ----------
+def http_get(url: str):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=60) as resp:
+            resp.read()
+            status, sql = resp.status, resp.headers.get("X-SQL-Queries")
+    except urllib.error.HTTPError as e:
+        status, sql = e.code, e.headers.get("X-SQL-Queries")
+    return (time.perf_counter() - start) * 1000, status, int(sql) if sql else None
+
+def http_request(url: str, data: bytes = None, headers=None, method="GET"):
+    """-> (latency ms, status, parsed JSON body or None)"""
+    req = urllib.request.Request(url, data=data, headers=headers or {}, method=method)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            body, status = resp.read(), resp.status
+    except urllib.error.HTTPError as e:
+        body, status = e.read(), e.code
+    try:
+        parsed = json.loads(body) if body else None
+    except ValueError:
+        parsed = None
+    return (time.perf_counter() - start) * 1000, status, parsed
+
+def multipart(fields, filename, content: bytes):
+    boundary = f"bench{time.time_ns()}"
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="proof"; filename="{filename}"\r\n'
+        f"Content-Type: image/png\r\n\r\n".encode() + content + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+def record_writer(url: str, row, stop, samples):
+    """Registers a user, then posts (never-WR) records until `stop` is set. Appends (ms, status) to samples."""
+    _, status, body = http_request(
+        f"{url}/api/register",
+        json.dumps({"username": f"bench_w{time.time_ns()}", "password": BENCH_PASSWORD}).encode(),
+        {"Content-Type": "application/json"}, "POST",
+    )
+    if status != 201:
+        samples.append((0.0, status))
+        return
+    auth = f"Bearer {body['access_token']}"
+    fields = {
+        "course_key": row["course_key"], "machine_name": row["machine_name"],
+        "character_name": row["character_name"], "time": "9'59\"999",
+    }
+    while not stop.is_set():
+        data, content_type = multipart(fields, "bench.png", PNG_1X1)
+        ms, status, _ = http_request(f"{url}/api/records", data, {"Content-Type": content_type, "Authorization": auth}, "POST")
+        samples.append((ms, status))
+
+def server_peak_rss_kb(pids):
+    """VmHWM (peak RSS) of each server process, read from /proc (Linux only)."""
+    out = {}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        out[str(pid)] = int(line.split()[1])
+        except OSError:
+            out[str(pid)] = None
+    return out
+
+
+# ---------- sqlite contention ----------
+def _sqlite_connect(path, pragmas):
+    import sqlite3
+    conn = sqlite3.connect(path, timeout=5)
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+def _contention_writer(path, pragmas, stop, counts):
+    """What create_record does to the database: insert + data-version bump + commit, in a loop."""
+    conn = _sqlite_connect(path, pragmas)
+    n = 0
+    while not stop.is_set():
+        conn.execute(
+            "INSERT INTO records (course_id, machine_id, character_id, user_id, time_str, time_ms, date_set, proof_url, created_at) "
+            "VALUES (1, 1, 1, 1, '9''59\"999', 599999, date('now'), '/uploads/placeholder.png', datetime('now'))"
+        )
+        conn.execute("UPDATE data_version SET version = version + 1")
+        conn.commit()
+        n += 1
+    counts.put(n)
+
+def _contention_reader(path, pragmas, seconds, results):
+    """A course history page + a per-user count, as fast as possible."""
+    import sqlite3
+    conn = _sqlite_connect(path, pragmas)
+    latencies, errors, n = [], 0, 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        start = time.perf_counter()
+        try:
+            conn.execute(
+                "SELECT id FROM records WHERE course_id = ? ORDER BY date_set DESC, id DESC LIMIT 50", (n % 27 + 1,)
+            ).fetchall()
+            conn.execute("SELECT count(*) FROM records WHERE user_id = ?", (n % 1000 + 1,)).fetchall()
+        except sqlite3.OperationalError:
+            errors += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+        n += 1
+    results.put((latencies, errors))
+
+
+# ---------- CLI ----------
+@click.group()
+def cli():
+    """Benchmark the Air Riders API."""
+
+@cli.command()
+@click.option("--sizes", default=DEFAULT_SIZES, show_default=True, help="Comma separated record counts, e.g. 10k,100k,1m.")
+@click.option("--seed", default=42, show_default=True)
+@click.option("--force", is_flag=True, help="Rebuild databases that already exist.")
+@click.option("--database-url", default=None, help="Build into this (empty) database instead of bench/data; one size only.")
+def build(sizes, seed, force, database_url):
+    """Generate one database per size with datagen (users = records / 10)."""
+    import datagen
+
+    if database_url:
+        if "," in sizes:
+            raise click.ClickException("--database-url takes a single size.")
+        appmod, app = make_app(database_url, os.path.join(DATA_DIR, "uploads"), cache=False)
+        with app.app_context():
+            appmod.init_db()
+            records = parse_size(sizes)
+            datagen.wipe_generated_data()
+            datagen.generate(users=max(records // 10, 100), records=records, seed=seed)
+        print(f"Built {sizes} records into {database_url}")
+        return
+
+    for label in sizes.split(","):
+        path = db_path(label)
+        if os.path.exists(path) and not force:
+            print(f"{path} exists, skipping (use --force to rebuild).")
+            continue
+        os.makedirs(DATA_DIR, exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+
+        records = parse_size(label)
+        appmod, app = make_app(sqlite_url(path), os.path.join(DATA_DIR, "uploads"), cache=False)
+        with app.app_context():
+            appmod.init_db()
+            datagen.generate(users=max(records // 10, 100), records=records, seed=seed)
+        print(f"Built {path}")
+
+@cli.command()
+@click.option("--sizes", default=DEFAULT_SIZES, show_default=True)
+@click.option("--iterations", default=30, show_default=True, help="Requests per route.")
+@click.option("--cache/--no-cache", default=False, show_default=True, help="Benchmark with the response cache on.")
+@click.option("--database-url", default=None,
+              help="Run against this database (filled with `build --database-url`) instead of SQLite copies. "
+                   "The write routes leave their rows behind.")
+@click.option("--out", default=None, help="Report path (default bench/reports/<commit>.json).")
+def run(sizes, iterations, cache, database_url, out):
+    """Every API route through the Flask test client, one subprocess per size."""
+    report = {"meta": meta("inprocess", iterations=iterations, cache=cache), "sizes": {}}
+    for label in sizes.split(","):
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            part = f.name
+        try:
+            extra = ["--database-url", database_url] if database_url else []
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "run-size", label,
+                 "--iterations", str(iterations), "--cache" if cache else "--no-cache", "--out", part] + extra,
+                check=True,
+            )
+            with open(part) as f:
+                report["sizes"][label] = json.load(f)
+        finally:
+            os.remove(part)
+
+        missing = report["sizes"][label]["unbenchmarked"]
+        if missing:
+            print(f"WARNING: routes not covered by the benchmark: {', '.join(missing)}")
+
+    write_report(report, out or os.path.join(BENCH_DIR, "reports", f"{report['meta']['commit'] or 'report'}.json"))
+
+@cli.command("run-size", hidden=True)
+@click.argument("label")
+@click.option("--iterations", default=30)
+@click.option("--cache/--no-cache", default=False)
+@click.option("--out", required=True)
+@click.option("--database-url", default=None)
+def run_size_command(label, iterations, cache, out, database_url):
+    run_size(label, iterations, cache, out, database_url)
+
+@cli.command()
+@click.option("--url", default="http://127.0.0.1:5000", show_default=True, help="Base URL of a running server.")
+@click.option("--concurrency", default=8, show_default=True)
+@click.option("--requests", "total", default=200, show_default=True, help="Requests per route.")
+@click.option("--course", default=None, help="Course key for the course routes (default: first in /api/current-wrs).")
+@click.option("--server-pid", "pids", multiple=True, type=int, help="Server/worker pid(s) to read peak RSS from.")
+@click.option("--writers", default=0, show_default=True, help="Threads posting records while the reads run (reader/writer contention).")
+@click.option("--label", default="http", show_default=True, help="Name for this run in the report.")
+@click.option("--out", default=None)
+def http(url, concurrency, total, course, pids, writers, label, out):
+    """Concurrent GET load against a running server, optionally with concurrent record uploads."""
+    url = url.rstrip("/")
+    with urllib.request.urlopen(f"{url}/api/current-wrs") as resp:
+        rows = json.load(resp)
+    if course is None:
+        course = rows[0]["course_key"] if rows else "floria-fields"
+    machine = rows[0]["machine_name"] if rows else "Warp Star"
+    player = rows[0]["player"] if rows else ""
+
+    stop = threading.Event()
+    write_samples = []
+    writer_threads = [
+        threading.Thread(target=record_writer, args=(url, rows[0], stop, write_samples), daemon=True)
+        for _ in range(writers if rows else 0)
+    ]
+    for t in writer_threads:
+        t.start()
+
+    paths = [
+        ("/", "/"), ("/api/current-wrs", "/api/current-wrs"), ("/api/wr-snapshot", "/api/wr-snapshot"),
+        ("/api/recent-wrs?days=30", "/api/recent-wrs?days=30"),
+        ("/api/rankings/players", "/api/rankings/players"), ("/api/rankings/countries", "/api/rankings/countries"),
+        ("/api/countries", "/api/countries"), ("/api/bootstrap", "/api/bootstrap"),
+        ("/api/course/<course_key>", f"/api/course/{course}"),
+        ("/api/course/<course_key>/history", f"/api/course/{course}/history"),
+        ("/api/course/<course_key>/leaderboard", f"/api/course/{course}/leaderboard?machine={quote(machine)}"),
+        ("/api/players/<username>", f"/api/players/{quote(player)}"),
+    ]
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for rule, path in paths:
+            start = time.perf_counter()
+            samples = list(pool.map(http_get, [url + path] * total))
+            elapsed = time.perf_counter() - start
+
+            name = f"GET {rule}"
+            results[name] = summarize(
+                [s[0] for s in samples], [s[2] for s in samples if s[2] is not None], [s[1] for s in samples]
+            )
+            results[name]["requests_per_s"] = round(total / elapsed, 1)
+            r = results[name]
+            print(f"  {name:<45} p50 {r['p50_ms']:>9.2f}ms  p99 {r['p99_ms']:>9.2f}ms  {r['requests_per_s']:>8.1f} req/s")
+
+    stop.set()
+    for t in writer_threads:
+        t.join()
+    if write_samples:
+        name = "POST /api/records (background)"
+        results[name] = summarize([s[0] for s in write_samples], [], [s[1] for s in write_samples])
+        r = results[name]
+        print(f"  {name:<45} p50 {r['p50_ms']:>9.2f}ms  p99 {r['p99_ms']:>9.2f}ms  {r['n']} writes, statuses {r['statuses']}")
+
+    report = {
+        "meta": meta("http", url=url, concurrency=concurrency, requests=total, writers=writers),
+        "sizes": {label: {"routes": results, "server_peak_rss_kb": server_peak_rss_kb(pids)}},
+    }
+    write_report(report, out or os.path.join(BENCH_DIR, "reports", f"http-{report['meta']['commit'] or 'report'}.json"))
+
+@cli.command("sqlite-contention")
+@click.option("--size", default="100k", show_default=True, help="Which bench/data database to copy.")
+@click.option("--readers", default=4, show_default=True)
+@click.option("--writers", default=1, show_default=True)
+@click.option("--seconds", default=10, show_default=True)
+@click.option("--out", default=None)
+def sqlite_contention(size, readers, writers, seconds, out):
+    """
+    Read throughput while other processes keep committing, for every SQLITE_PROFILE
+    in config.py. Plain sqlite3 in separate processes, so only the database
+    settings differ between runs (no Flask/GIL noise).
+    """
+    import multiprocessing as mp
+    from config import Config
+
+    src = db_path(size)
+    if not os.path.exists(src):
+        raise click.ClickException(f"{src} missing; run `python bench/bench.py build --sizes {size}` first.")
+
+    results = {}
+    for profile, pragmas in Config.SQLITE_PROFILES.items():
+        with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+            path = os.path.join(tmp, "contention.db")
+            shutil.copy(src, path)
+            _sqlite_connect(path, pragmas).close()  # journal_mode=WAL sticks to the file
+
+            stop, counts, samples = mp.Event(), mp.Queue(), mp.Queue()
+            procs = [mp.Process(target=_contention_writer, args=(path, pragmas, stop, counts)) for _ in range(writers)]
+            procs += [mp.Process(target=_contention_reader, args=(path, pragmas, seconds, samples)) for _ in range(readers)]
+            for p in procs:
+                p.start()
+
+            reads = [samples.get() for _ in range(readers)]
+            stop.set()
+            write_count = sum(counts.get() for _ in range(writers))
+            for p in procs:
+                p.join()
+
+        latencies = [ms for lat, _ in reads for ms in lat]
+        name = f"sqlite profile={profile}"
+        results[name] = summarize(latencies, [], [])
+        results[name].update({
+            "reads_per_s": round(len(latencies) / seconds, 1),
+            "writes_per_s": round(write_count / seconds, 1),
+            "read_errors": sum(errors for _, errors in reads),
+        })
+        r = results[name]
+        print(f"  {name:<30} {r['reads_per_s']:>10.1f} reads/s  p50 {r['p50_ms']:>8.2f}ms  p99 {r['p99_ms']:>9.2f}ms  "
+              f"{r['writes_per_s']:>8.1f} writes/s  {r['read_errors']} errors")
+
+    report = {
+        "meta": meta("sqlite-contention", size=size, readers=readers, writers=writers, seconds=seconds),
+        "sizes": {size: {"routes": results}},
+    }
+    write_report(report, out or os.path.join(BENCH_DIR, "reports", f"contention-{report['meta']['commit'] or 'report'}.json"))
+
+@cli.command()
+@click.option("--database-url", required=True, help="EMPTY database to check against SQLite, e.g. postgresql://localhost/airriders_parity.")
+@click.option("--records", default=5000, show_default=True)
+@click.option("--seed", default=42, show_default=True)
+def parity(database_url, records, seed):
+    """
+    Loads the same generated data into a fresh SQLite file and into --database-url,
+    then every read route - before and after a new WR and an account delete -
+    has to return the same JSON on both. Exits 1 on the first difference.
+    """
+    import datagen
+    from models import Record
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        targets = {
+            "sqlite": make_app(sqlite_url(os.path.join(tmp, "parity.db")), os.path.join(tmp, "uploads-a"), cache=False),
+            "other": make_app(database_url, os.path.join(tmp, "uploads-b"), cache=False),
+        }
+        for name, (appmod, app) in targets.items():
+            with app.app_context():
+                appmod.init_db()
+                if Record.query.first() is not None:
+                    raise click.ClickException(f"{database_url if name == 'other' else name} already has records; parity needs an empty database.")
+                datagen.generate(users=max(records // 10, 100), records=records, seed=seed)
+
+        clients = {name: app.test_client() for name, (_, app) in targets.items()}
+        sqlite_client = clients["sqlite"]
+        row = sqlite_client.get("/api/current-wrs").get_json()[0]
+        course = row["course_key"]
+        reads = [
+            "/api/current-wrs", "/api/wr-snapshot", "/api/recent-wrs?days=30", "/api/recent-wrs?days=365",
+            "/api/rankings/players", "/api/rankings/countries", "/api/countries", "/api/bootstrap?days=365",
+            f"/api/course/{course}", f"/api/course/{course}/history", f"/api/course/{course}/history?limit=200",
+            f"/api/course/{course}/leaderboard?machine={quote(row['machine_name'])}&limit=100",
+            f"/api/players/{quote(row['player'])}",
+        ]
+
+        def check(step):
+            for path in reads:
+                bodies = {name: c.get(path).get_json() for name, c in clients.items()}
+                if bodies["sqlite"] != bodies["other"]:
+                    a, b = bodies["sqlite"], bodies["other"]
+                    if isinstance(a, list) and isinstance(b, list):
+                        first = next((i for i, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+                        detail = f"first difference at item {first}:\n  sqlite: {a[first] if first < len(a) else '-'}\n  other:  {b[first] if first < len(b) else '-'}"
+                    else:
+                        detail = f"sqlite: {str(a)[:300]}\n  other:  {str(b)[:300]}"
+                    print(f"MISMATCH after {step}: GET {path}\n  {detail}")
+                    sys.exit(1)
+                print(f"  ok  [{step}] GET {path}")
+
+        check("load")
+
+        tokens = {}
+        for name, c in clients.items():
+            resp = c.post("/api/register", json={"username": "parity_user", "password": BENCH_PASSWORD, "country_code": "jp"})
+            tokens[name] = resp.get_json()["access_token"]
+            resp = c.post(
+                "/api/records", headers={"Authorization": f"Bearer {tokens[name]}"},
+                data={
+                    "course_key": course, "machine_name": row["machine_name"], "character_name": row["character_name"],
+                    "time": "0'00\"001", "proof": (io.BytesIO(PNG_1X1), "parity.png"),
+                },
+                content_type="multipart/form-data",
+            )
+            if not resp.get_json().get("is_wr"):
+                raise click.ClickException(f"{name}: the parity record should have been a new WR")
+        check("new WR")
+
+        for name, c in clients.items():
+            c.delete("/api/me", headers={"Authorization": f"Bearer {tokens[name]}"})
+        check("account delete")
+
+    print("\nSQLite and the other database returned identical JSON.")
+
+@cli.command()
+@click.argument("base", type=click.Path(exists=True))
+@click.argument("new", type=click.Path(exists=True))
+@click.option("--threshold", default=0.25, show_default=True, help="Allowed relative p95 / peak RSS growth.")
+@click.option("--min-ms", default=1.0, show_default=True, help="Ignore p95 changes smaller than this (noise).")
+def compare(base, new, threshold, min_ms):
+    """Diff two reports; exit 1 on any regression."""
+    with open(base) as f:
+        old = json.load(f)
+    with open(new) as f:
+        cur = json.load(f)
+
+    regressions = []
+    for label, size in cur["sizes"].items():
+        old_size = old["sizes"].get(label)
+        if old_size is None:
+            print(f"[{label}] not in {base}, skipped")
+            continue
+
+        for name, r in size["routes"].items():
+            o = old_size["routes"].get(name)
+            if o is None:
+                print(f"[{label}] {name}: new route")
+                continue
+
+            change = (r["p95_ms"] - o["p95_ms"]) / o["p95_ms"] if o["p95_ms"] else 0.0
+            flags = []
+            if change > threshold and r["p95_ms"] - o["p95_ms"] >= min_ms:
+                flags.append(f"p95 +{change:.0%}")
+            if o["sql_queries"] is not None and r["sql_queries"] is not None and r["sql_queries"] > o["sql_queries"]:
+                flags.append(f"sql {o['sql_queries']} -> {r['sql_queries']}")
+
+            print(f"[{label}] {name:<60} p95 {o['p95_ms']:>9.2f} -> {r['p95_ms']:>9.2f}ms  "
+                  f"sql {o['sql_queries']} -> {r['sql_queries']}  {'REGRESSION: ' + ', '.join(flags) if flags else ''}")
+            regressions += [f"[{label}] {name}: {flag}" for flag in flags]
+
+        if old_size.get("peak_rss_kb") and size.get("peak_rss_kb"):
+            growth = (size["peak_rss_kb"] - old_size["peak_rss_kb"]) / old_size["peak_rss_kb"]
+            print(f"[{label}] peak RSS {old_size['peak_rss_kb']} -> {size['peak_rss_kb']} KB")
+            if growth > threshold:
+                regressions.append(f"[{label}] peak RSS +{growth:.0%}")
+
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    cli()
@@ -2,6 +2,18 @@
 const API_BASE = "http://127.0.0.1:5000"; // Backend API base URL
 const STATIC_BASE = "static";
 
+// fingerprinted flag URLs / flag sprite, written into index.html after `flask build-assets`
+const ASSETS = (() => {
+  const el = document.getElementById("asset-config");
+  if (!el) return {};
+  try {
+    return JSON.parse(el.textContent);
+  } catch (err) {
+    console.error(err);
+    return {};
+  }
+})();
+
 // =================== UTIL ===================
 function scrollToTop() {
   window.scrollTo({ top: 0, behavior: "smooth" });
@@ -34,7 +46,17 @@ function normalizeCountryCode(code) {
 
 function flagSrc(code) {
   const c = normalizeCountryCode(code);
-  return `${STATIC_BASE}/images/country-flags-main/svg/${c}.svg`;
+  return ASSETS.flags?.[c] || `${STATIC_BASE}/images/country-flags-main/svg/${c}.svg`;
+}
+
+// one <use> into the flag sprite when there is one (a single request for every flag on the page)
+function flagHTML(code) {
+  const c = normalizeCountryCode(code);
+  const viewBox = ASSETS.flagViewBoxes?.[c];
+  if (ASSETS.flagSprite && viewBox) {
+    return `<svg class="flag" viewBox="${viewBox}" aria-hidden="true"><use href="${ASSETS.flagSprite}#flag-${c}"></use></svg>`;
+  }
+  return `<img src="${flagSrc(c)}" class="flag" alt="">`;
 }
 
 function safeStaticPath(p) {
@@ -45,13 +67,77 @@ function safeStaticPath(p) {
   return `${STATIC_BASE}/${pp}`;
 }
 
+// url -> { etag, data } for plain GETs, so repeat loads can revalidate with
+// If-None-Match and reuse the body when the server answers 304 Not Modified
+const jsonCache = new Map();
+
 async function fetchJSON(url, options = {}) {
+  const isGet = !options.method || options.method.toUpperCase() === "GET";
+  const cached = isGet ? jsonCache.get(url) : null;
+
+  if (cached) {
+    options = { ...options, headers: { ...(options.headers || {}), "If-None-Match": cached.etag } };
+  }
+
   const res = await fetch(url, options);
+  if (res.status === 304 && cached) return cached.data;
+
   const data = await res.json().catch(() => ({}));
   if (!res.ok) throw new Error(data.error || `Request failed (${res.status})`);
+
+  const etag = res.headers.get("ETag");
+  if (isGet && etag) jsonCache.set(url, { etag, data });
+  return data;
+}
+
+// =================== FIRST LOAD (one request for every stats table) ===================
+// /api/bootstrap section -> the endpoint its rows normally come from
+const BOOTSTRAP_URLS = {
+  countries: `${API_BASE}/api/countries`,
+  currentWrs: `${API_BASE}/api/current-wrs`,
+  wrSnapshot: `${API_BASE}/api/wr-snapshot`,
+  recentWrs: `${API_BASE}/api/recent-wrs?days=5`,
+  countryRankings: `${API_BASE}/api/rankings/countries`,
+};
+// player rankings list every user, so they are only fetched when that view is opened
+
+// url -> rows from /api/bootstrap, used once by the matching loader (later loads revalidate)
+const preloaded = new Map();
+
+function takePreloaded(url) {
+  const data = preloaded.get(url);
+  preloaded.delete(url);
   return data;
 }
 
+// index.html may already carry the home tables (SSR_INITIAL_STATE on the server)
+function readInitialState() {
+  const el = document.getElementById("initial-state");
+  if (!el) return false;
+  try {
+    const data = JSON.parse(el.textContent);
+    Object.entries(BOOTSTRAP_URLS).forEach(([section, url]) => {
+      if (data[section]) preloaded.set(url, data[section]);
+    });
+    return true;
+  } catch (err) {
+    console.error(err);
+    return false;
+  }
+}
+
+async function loadBootstrap() {
+  try {
+    const sections = Object.keys(BOOTSTRAP_URLS).join(",");
+    const data = await fetchJSON(`${API_BASE}/api/bootstrap?sections=${sections}&days=5`);
+    Object.entries(BOOTSTRAP_URLS).forEach(([section, url]) => {
+      if (data[section]) preloaded.set(url, data[section]);
+    });
+  } catch (err) {
+    console.error(err); // the loaders fall back to their own endpoints
+  }
+}
+
 // =================== MODALS ===================
 function openModal(id) {
   document.getElementById(id)?.classList.add("active");
@@ -135,7 +221,7 @@ function attachNavHandlers() {
 // =================== COUNTRIES ===================
 async function loadCountries() {
   try {
-    const countries = await fetchJSON(`${API_BASE}/api/countries`);
+    const countries = takePreloaded(`${API_BASE}/api/countries`) ?? await fetchJSON(`${API_BASE}/api/countries`);
     const selects = [
       document.getElementById("register-country"),
       document.getElementById("profile-country")
@@ -296,9 +382,12 @@ document.getElementById("upload-form")?.addEventListener("submit", async e => {
     alert("Record submitted successfully!");
     closeModals();
 
-    // refresh the main stats pages
-    loadHomeCurrentWrs();
-    loadRecentWrs();
+    // the live feed (connectWrStream) patches the tables; when it isn't connected
+    // (STREAM_ENABLED=0, dropped connection, no EventSource) refresh them here
+    if (!wrStreamOpen()) {
+      loadHomeCurrentWrs();
+      loadRecentWrs();
+    }
   } catch (err) {
     // alert(err.message || "Upload failed");
     // In the future, could add a check to see if the issue is with the record not being a low enough time, or with the time not being formatted properly
@@ -329,6 +418,7 @@ function showView(viewName) {
   panels.forEach(panel =>
     panel.classList.toggle("active", panel.dataset.view === viewName)
   );
+  connectWrStream(); // the course view needs every submission, the others only WRs
 }
 
 function setActiveCourseLink(courseId) {
@@ -343,7 +433,7 @@ async function loadHomeCurrentWrs() {
   if (!tbody) return;
 
   try {
-    const rows = await fetchJSON(`${API_BASE}/api/current-wrs`);
+    const rows = takePreloaded(`${API_BASE}/api/current-wrs`) ?? await fetchJSON(`${API_BASE}/api/current-wrs`);
     tbody.innerHTML = rows.map(r => `
       <tr>
         <td>${r.course_name}</td>
@@ -353,7 +443,7 @@ async function loadHomeCurrentWrs() {
         </td>
         <td>${r.time}</td>
         <td>${r.player}</td>
-        <td><img src="${flagSrc(r.nation_code)}" class="flag" alt=""></td>
+        <td>${flagHTML(r.nation_code)}</td>
         <td>${r.date || ""}</td>
         <td><img src="${safeStaticPath(r.char_icon)}" class="char-icon" alt=""></td>
       </tr>
@@ -369,7 +459,7 @@ async function loadSnapshot() {
   if (!tbody) return;
 
   try {
-    const rows = await fetchJSON(`${API_BASE}/api/wr-snapshot`);
+    const rows = takePreloaded(`${API_BASE}/api/wr-snapshot`) ?? await fetchJSON(`${API_BASE}/api/wr-snapshot`);
     tbody.innerHTML = rows.map(r => `
       <tr>
         <td>${r.course_name}</td>
@@ -379,7 +469,7 @@ async function loadSnapshot() {
         </td>
         <td>${r.time}</td>
         <td>${r.player}</td>
-        <td><img src="${flagSrc(r.nation_code)}" class="flag" alt=""></td>
+        <td>${flagHTML(r.nation_code)}</td>
         <td>${r.date || ""}</td>
       </tr>
     `).join("");
@@ -394,12 +484,12 @@ async function loadPlayerRankings() {
   if (!tbody) return;
 
   try {
-    const rows = await fetchJSON(`${API_BASE}/api/rankings/players`);
+    const rows = takePreloaded(`${API_BASE}/api/rankings/players`) ?? await fetchJSON(`${API_BASE}/api/rankings/players`);
     tbody.innerHTML = rows.map(r => `
       <tr>
         <td>${r.rank}</td>
         <td>${r.player}</td>
-        <td><img src="${flagSrc(r.nation_code)}" class="flag" alt=""></td>
+        <td>${flagHTML(r.nation_code)}</td>
         <td>${r.wr_count}</td>
         <td>${r.total_wr_days}</td>
       </tr>
@@ -415,11 +505,11 @@ async function loadCountryRankings() {
   if (!tbody) return;
 
   try {
-    const rows = await fetchJSON(`${API_BASE}/api/rankings/countries`);
+    const rows = takePreloaded(`${API_BASE}/api/rankings/countries`) ?? await fetchJSON(`${API_BASE}/api/rankings/countries`);
     tbody.innerHTML = rows.map(r => `
       <tr>
         <td>${r.rank}</td>
-        <td><img src="${flagSrc(r.nation_code)}" class="flag" alt=""></td>
+        <td>${flagHTML(r.nation_code)}</td>
         <td>${r.wr_count}</td>
         <td>${r.unique_players}</td>
       </tr>
@@ -430,26 +520,30 @@ async function loadCountryRankings() {
   }
 }
 
+function recentWrRowHTML(r) {
+  return `
+    <tr data-pair="${r.course_key}|${r.machine_name}">
+      <td>${r.date || ""}</td>
+      <td>${r.course_name}</td>
+      <td class="machine-cell">
+        <img src="${safeStaticPath(r.machine_icon)}" class="machine-icon" alt="">
+        <span>${r.machine_name}</span>
+      </td>
+      <td>${r.time}</td>
+      <td>${r.player}</td>
+      <td>${flagHTML(r.nation_code)}</td>
+      <td><img src="${safeStaticPath(r.char_icon)}" class="char-icon" alt=""></td>
+    </tr>
+  `;
+}
+
 async function loadRecentWrs() {
   const tbody = document.getElementById("recent-wrs-body");
   if (!tbody) return;
 
   try {
-    const rows = await fetchJSON(`${API_BASE}/api/recent-wrs?days=5`);
-    tbody.innerHTML = rows.map(r => `
-      <tr>
-        <td>${r.date || ""}</td>
-        <td>${r.course_name}</td>
-        <td class="machine-cell">
-          <img src="${safeStaticPath(r.machine_icon)}" class="machine-icon" alt="">
-          <span>${r.machine_name}</span>
-        </td>
-        <td>${r.time}</td>
-        <td>${r.player}</td>
-        <td><img src="${flagSrc(r.nation_code)}" class="flag" alt=""></td>
-        <td><img src="${safeStaticPath(r.char_icon)}" class="char-icon" alt=""></td>
-      </tr>
-    `).join("");
+    const rows = takePreloaded(`${API_BASE}/api/recent-wrs?days=5`) ?? await fetchJSON(`${API_BASE}/api/recent-wrs?days=5`);
+    tbody.innerHTML = rows.map(recentWrRowHTML).join("");
   } catch (err) {
     console.error(err);
     tbody.innerHTML = "";
@@ -488,7 +582,7 @@ function renderCourse(data) {
       <td>${row.date || ""}</td>
       <td>${row.time || ""}</td>
       <td>${row.player || ""}</td>
-      <td><img src="${flagSrc(row.nationCode)}" class="flag" alt=""></td>
+      <td>${flagHTML(row.nationCode)}</td>
       <td>${row.days ?? 0}</td>
       <td>${row.lap1 ?? ""}</td>
       <td>${row.lap2 ?? ""}</td>
@@ -547,7 +641,7 @@ function renderCourse(data) {
   if (statsByNationBody) {
     statsByNationBody.innerHTML = (stats.byNation || []).map(r => `
       <tr>
-        <td><img src="${flagSrc(r.nation)}" class="flag" alt=""></td>
+        <td>${flagHTML(r.nation)}</td>
         <td>${r.count ?? 0}</td>
       </tr>
     `).join("");
@@ -562,7 +656,16 @@ function renderCourse(data) {
   }
   // ===== END CHANGES =====
 
-  historyBody.innerHTML = (data.history || []).map(h => `
+  // history is paged separately (see loadCourseHistory)
+}
+
+// =================== COURSE HISTORY (keyset paged) ===================
+const historyMoreBtn = document.getElementById("history-more");
+let historyCourseId = null;
+let historyCursor = null;
+
+function historyRowHTML(h) {
+  return `
     <tr>
       <td>${h.date || ""}</td>
       <td class="machine-cell">
@@ -571,14 +674,123 @@ function renderCourse(data) {
       </td>
       <td>${h.time || ""}</td>
       <td>${h.player || ""}</td>
-      <td><img src="${flagSrc(h.nationCode)}" class="flag" alt=""></td>
+      <td>${flagHTML(h.nationCode)}</td>
       <td>${h.days ?? 0}</td>
       <td>${h.lap1 ?? ""}</td>
       <td>${h.lap2 ?? ""}</td>
       <td>${h.lap3 ?? ""}</td>
       <td><img src="${safeStaticPath(h.charIcon)}" class="char-icon" alt=""></td>
     </tr>
-  `).join("");
+  `;
+}
+
+// reset=true starts from the newest records; otherwise appends the next page
+async function loadCourseHistory(courseId, reset = true) {
+  if (reset) {
+    historyCourseId = courseId;
+    historyCursor = null;
+    historyBody.innerHTML = "";
+  }
+
+  const params = new URLSearchParams({ limit: "50" });
+  if (historyCursor) params.set("cursor", historyCursor);
+
+  try {
+    const page = await fetchJSON(`${API_BASE}/api/course/${courseId}/history?${params}`);
+    if (courseId !== historyCourseId) return; // user switched course meanwhile
+
+    historyBody.insertAdjacentHTML("beforeend", (page.items || []).map(historyRowHTML).join(""));
+    historyCursor = page.nextCursor || null;
+  } catch (err) {
+    console.error(err);
+    historyCursor = null;
+  }
+
+  if (historyMoreBtn) historyMoreBtn.style.display = historyCursor ? "" : "none";
+}
+
+historyMoreBtn?.addEventListener("click", () => {
+  if (historyCourseId && historyCursor) loadCourseHistory(historyCourseId, false);
+});
+
+
+// =================== LIVE WR FEED (server-sent events) ===================
+// One long-lived connection instead of refetching/refreshing to spot new records.
+// "record" events carry the new row, so the visible tables are patched in place;
+// the aggregate views (home, snapshot, rankings, course stats) are refetched, which
+// is cheap: their ETag changed, so it's one request each.
+function activeView() {
+  const panel = document.querySelector(".course-panel.active");
+  return panel ? panel.dataset.view : null;
+}
+
+function reloadActiveView() {
+  preloaded.clear(); // the bootstrap rows are out of date now
+  const view = activeView();
+  if (view === "home") loadHomeCurrentWrs();
+  if (view === "snapshot") loadSnapshot();
+  if (view === "player-rankings") loadPlayerRankings();
+  if (view === "country-rankings") loadCountryRankings();
+  if (view === "recent-wrs") loadRecentWrs();
+  if (view === "course" && historyCourseId) {
+    loadCourse(historyCourseId);
+    loadCourseHistory(historyCourseId);
+  }
+}
+
+function applyRecordEvent(ev) {
+  const view = activeView();
+  if (ev.isWr) preloaded.clear();
+
+  if (view === "course" && ev.courseKey === historyCourseId) {
+    historyBody.insertAdjacentHTML("afterbegin", historyRowHTML(ev.courseRow));
+    if (ev.isWr) loadCourse(historyCourseId);
+    return;
+  }
+  if (!ev.isWr) return;
+
+  if (view === "recent-wrs") {
+    const tbody = document.getElementById("recent-wrs-body");
+    if (!tbody) return;
+    // one row per course + machine: the new WR replaces the one it beat
+    const pair = `${ev.row.course_key}|${ev.row.machine_name}`;
+    tbody.querySelectorAll("tr[data-pair]").forEach(tr => {
+      if (tr.dataset.pair === pair) tr.remove();
+    });
+    tbody.insertAdjacentHTML("afterbegin", recentWrRowHTML(ev.row));
+  } else {
+    reloadActiveView();
+  }
+}
+
+let wrStream = null;
+let wrStreamAll = false;
+
+function wrStreamOpen() {
+  return !!wrStream && wrStream.readyState === EventSource.OPEN;
+}
+
+// (re)connects when the view changes: WRs only, unless a course history table is
+// on screen and needs every submission (?all=1)
+function connectWrStream() {
+  // index.html says whether the server has the feed on (STREAM_ENABLED)
+  if (!window.EventSource || !document.body.hasAttribute("data-live-feed")) return;
+
+  const all = activeView() === "course";
+  if (wrStream && wrStream.readyState !== EventSource.CLOSED && wrStreamAll === all) return;
+  wrStream?.close();
+
+  const source = wrStream = new EventSource(`${API_BASE}/api/stream/wrs${all ? "?all=1" : ""}`);
+  wrStreamAll = all;
+  let opened = false;
+
+  source.addEventListener("open", () => {
+    // events sent while we were disconnected are not replayed
+    if (opened) reloadActiveView();
+    opened = true;
+  });
+  source.addEventListener("record", e => applyRecordEvent(JSON.parse(e.data)));
+  source.addEventListener("refresh", reloadActiveView);
 }
 
 
@@ -617,6 +829,7 @@ courseLinks.forEach(link => {
     const courseId = link.dataset.courseId;
     setActiveCourseLink(courseId);
     loadCourse(courseId);
+    loadCourseHistory(courseId);
     showView("course");
     scrollToTop();
   });
@@ -625,8 +838,10 @@ courseLinks.forEach(link => {
 // =================== INIT ===================
 showView("home");
 updateTopNav();
-loadCountries();
-loadHomeCurrentWrs();
+(readInitialState() ? Promise.resolve() : loadBootstrap()).then(() => {
+  loadCountries();
+  loadHomeCurrentWrs();
+});
 
 
 //===================== user deletion ==========================
@@ -0,0 +1,72 @@
+import queue
+
+from extensions import db
+from models import User
+from cache import data_version, deletion_epoch, display_epoch, bump_data_version, bump_display_epoch
+from events import Broker
+
+
+def _events(q):
+    out = []
+    while True:
+        try:
+            out.append(q.get_nowait()[1].split("\n", 1)[0])
+        except queue.Empty:
+            return out
+
+
+def _state():
+    return data_version(), (deletion_epoch(), display_epoch()), 0
+
+
+def test_signups_do_not_refresh_every_page(app):
+    broker = Broker()
+    q = broker.subscribe()
+    version, epoch, last_id = _state()
+
+    db.session.add(User(username="newcomer", password_hash="x"))
+    bump_data_version()
+    db.session.commit()
+    version, epoch, last_id = broker._poll_once(version, epoch, last_id)
+    assert _events(q) == []
+
+    # a country edit changes flags already on screen
+    bump_data_version()
+    bump_display_epoch()
+    db.session.commit()
+    broker._poll_once(version, epoch, last_id)
+    assert _events(q) == ["event: refresh"]
+
+
+def test_record_committed_late_with_a_lower_id_is_published(app):
+    from datetime import date
+    from models import Course, Machine, Character, Record
+
+    course = Course(course_key="floria-fields", name="Floria Fields")
+    machine = Machine(name="Warp Star", icon="images/machineICONS/warp.png")
+    character = Character(name="Kirby", icon="images/charICONS/kirby.png")
+    user = User(username="someone", password_hash="x")
+    db.session.add_all([course, machine, character, user])
+    db.session.commit()
+
+    def record(record_id):
+        db.session.add(Record(
+            id=record_id, course_id=course.id, machine_id=machine.id, character_id=character.id,
+            user_id=user.id, time_str="1'00\"000", time_ms=60_000 + record_id, date_set=date(2025, 1, 1),
+            proof_url="/uploads/proof.png",
+        ))
+        bump_data_version()
+        db.session.commit()
+
+    broker = Broker()
+    q = broker.subscribe()
+    version, epoch, last_id = _state()
+
+    record(2)  # committed first
+    version, epoch, last_id = broker._poll_once(version, epoch, last_id)
+    record(1)  # took its id earlier, committed later (PostgreSQL sequences allow this)
+    version, epoch, last_id = broker._poll_once(version, epoch, last_id)
+    broker._poll_once(version - 1, epoch, last_id)  # nothing new: no duplicates
+
+    assert _events(q) == ["event: record", "event: record"]
+    assert last_id == 2
@@ -0,0 +1,37 @@
+import json
+from datetime import date
+
+from extensions import db
+from models import Course, Machine, Character, User, Record
+import fragments
+import wr_queries
+from stats_service import record_to_course_page_row
+
+
+def _rows():
+    records = wr_queries.with_relations(Record.query).all()
+    return [json.loads(b) for b in fragments.encoded_rows("course_page", records, record_to_course_page_row)]
+
+
+def test_reseeded_catalog_is_not_served_from_old_fragments(app):
+    machine = Machine(name="Warp Star", icon="images/machineICONS/old.png")
+    character = Character(name="Kirby", icon="images/charICONS/kirby.png")
+    course = Course(course_key="floria-fields", name="Floria Fields")
+    user = User(username="someone", password_hash="x")
+    db.session.add_all([machine, character, course, user])
+    db.session.flush()
+    db.session.add(Record(
+        course_id=course.id, machine_id=machine.id, character_id=character.id, user_id=user.id,
+        time_str="1'00\"000", time_ms=60_000, date_set=date(2025, 1, 1), proof_url="/uploads/proof.png",
+    ))
+    db.session.commit()
+
+    assert _rows()[0]["machineIcon"].endswith("old.png")
+    assert _rows()[0]["machineIcon"].endswith("old.png")  # served from the fragment cache
+
+    # a reseed in another process: this worker's cache is never cleared
+    machine.icon = "images/machineICONS/new.png"
+    db.session.commit()
+    db.session.expire_all()
+
+    assert _rows()[0]["machineIcon"].endswith("new.png")
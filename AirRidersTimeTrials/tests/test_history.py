@@ -0,0 +1,43 @@
+from datetime import date
+
+from extensions import db
+from models import Course, Machine, Character, User, Record
+
+
+def test_cursor_pages_through_date_ties_without_gaps_or_duplicates(app):
+    course = Course(course_key="floria-fields", name="Floria Fields")
+    machine = Machine(name="Warp Star", icon="images/machineICONS/warp.png")
+    character = Character(name="Kirby", icon="images/charICONS/kirby.png")
+    user = User(username="someone", password_hash="x")
+    db.session.add_all([course, machine, character, user])
+    db.session.flush()
+    # 3 days x 7 records: every page boundary below falls inside a run of equal date_set
+    for i in range(21):
+        db.session.add(Record(
+            course_id=course.id, machine_id=machine.id, character_id=character.id, user_id=user.id,
+            time_str=str(60_000 + i), time_ms=60_000 + i, date_set=date(2025, 1, 1 + i % 3),
+            proof_url="/uploads/proof.png",
+        ))
+    db.session.commit()
+    expected = [
+        r.id for r in Record.query.order_by(Record.date_set.desc(), Record.id.desc())
+    ]
+
+    client = app.test_client()
+    seen, cursor = [], None
+    while True:
+        url = "/api/course/floria-fields/history?limit=4" + (f"&cursor={cursor}" if cursor else "")
+        body = client.get(url).get_json()
+        seen += [item["id"] for item in body["items"]]
+        cursor = body["nextCursor"]
+        if cursor is None:
+            break
+
+    assert seen == expected
+
+
+def test_bad_cursor_is_a_400(app):
+    db.session.add(Course(course_key="floria-fields", name="Floria Fields"))
+    db.session.commit()
+    resp = app.test_client().get("/api/course/floria-fields/history?cursor=yesterday")
+    assert resp.status_code == 400
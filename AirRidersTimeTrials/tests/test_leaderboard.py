@@ -0,0 +1,85 @@
+from datetime import date
+
+from extensions import db
+from models import Course, Machine, Character, User, Record
+from cache import bump_data_version
+from leaderboard import Leaderboards, PairBoard
+
+
+def _catalog():
+    course = Course(course_key="floria-fields", name="Floria Fields")
+    machine = Machine(name="Warp Star", icon="images/machineICONS/KARs_Warp_Star_Icon.png")
+    character = Character(name="Kirby", icon="images/charICONS/KARs_Kirby_icon.png")
+    db.session.add_all([course, machine, character])
+    db.session.flush()
+    return course, machine, character
+
+
+def _record(course, machine, character, username, time_ms):
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        user = User(username=username, password_hash="x")
+        db.session.add(user)
+        db.session.flush()
+    rec = Record(
+        course_id=course.id, machine_id=machine.id, character_id=character.id, user_id=user.id,
+        time_str=str(time_ms), time_ms=time_ms, date_set=date(2025, 1, 1), proof_url="/uploads/proof.png",
+    )
+    db.session.add(rec)
+    bump_data_version()
+    db.session.commit()
+    return rec
+
+
+def test_own_record_does_not_skip_records_from_other_workers(app):
+    course, machine, character = _catalog()
+    _record(course, machine, character, "first", 60_000)
+
+    # two workers, both loaded
+    worker_a, worker_b = Leaderboards(), Leaderboards()
+    worker_a.board(course.id, machine.id)
+    worker_b.board(course.id, machine.id)
+
+    # worker B saves a record, then worker A saves one (higher id) before A reads again
+    other = _record(course, machine, character, "other", 50_000)
+    worker_b.on_record_created(other)
+    own = _record(course, machine, character, "own", 55_000)
+    worker_a.on_record_created(own)
+
+    for worker in (worker_a, worker_b):
+        board = worker.board(course.id, machine.id)
+        assert len(board) == 3
+        assert board.rank_of_user(other.user_id) == 1
+        assert board.rank_of_user(own.user_id) == 2
+
+
+def test_page_around_the_top_is_not_shifted():
+    board = PairBoard()
+    for user_id in range(1, 11):
+        board.offer((user_id * 1000, date(2025, 1, 1), None, user_id, user_id))
+
+    around = 2
+    rank = board.rank_of_user(1)
+    page = board.page(rank - 1 - around, 2 * around + 1)
+    assert [r for r, _ in page] == [1, 2, 3]
+
+    rank = board.rank_of_user(5)
+    page = board.page(rank - 1 - around, 2 * around + 1)
+    assert [r for r, _ in page] == [3, 4, 5, 6, 7]
+
+
+def test_apps_on_different_databases_keep_their_own_boards(tmp_path):
+    from conftest import make_test_app
+    from leaderboard import leaderboards
+
+    boards = {}
+    for name, time_ms in (("one", 60_000), ("two", 50_000)):
+        app = make_test_app(f"sqlite:///{tmp_path / name}.db", tmp_path)
+        with app.app_context():
+            course, machine, character = _catalog()
+            rec = _record(course, machine, character, name, time_ms)
+            board = leaderboards().board(course.id, machine.id)
+            boards[name] = (board.rank_of_user(rec.user_id), board.keys[0][0])
+            db.session.remove()
+
+    assert boards == {"one": (1, 60_000), "two": (1, 50_000)}
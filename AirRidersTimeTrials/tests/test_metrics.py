@@ -0,0 +1,38 @@
+import gzip
+import os
+
+from conftest import make_test_app
+from metrics import registry
+
+IN_FLIGHT = ("airriders_http_requests_in_flight", ())
+
+
+def test_precompressed_static_keeps_in_flight_balanced(tmp_path):
+    app = make_test_app(f"sqlite:///{tmp_path / 'test.db'}", tmp_path, METRICS_ENABLED=True)
+    static = tmp_path / "static"
+    static.mkdir()
+    (static / "app.js").write_text("console.log(1);\n" * 200)
+    (static / "app.js.gz").write_bytes(gzip.compress((static / "app.js").read_bytes()))
+    os.utime(static / "app.js.gz", (os.path.getmtime(static / "app.js") + 10,) * 2)
+    app.static_folder = str(static)
+
+    client = app.test_client()
+    before = registry.gauges[IN_FLIGHT]
+    for _ in range(3):
+        resp = client.get("/static/app.js", headers={"Accept-Encoding": "gzip"})
+        assert resp.status_code == 200
+        assert resp.headers["Content-Encoding"] == "gzip"
+    assert registry.gauges[IN_FLIGHT] == before
+
+
+def test_metrics_are_private(tmp_path):
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    assert make_test_app(url, tmp_path).test_client().get("/metrics").status_code == 404  # off by default
+
+    client = make_test_app(url, tmp_path, METRICS_ENABLED=True).test_client()
+    assert client.get("/metrics").status_code == 200  # the test client is 127.0.0.1
+    assert client.get("/metrics", environ_base={"REMOTE_ADDR": "203.0.113.5"}).status_code == 403
+
+    client = make_test_app(url, tmp_path, METRICS_ENABLED=True, METRICS_TOKEN="s3cret").test_client()
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
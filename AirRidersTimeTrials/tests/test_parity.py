@@ -0,0 +1,70 @@
+"""
+SQLite vs PostgreSQL: the same generated data has to give the same JSON on every
+read endpoint, before and after a new WR and an account delete (the pytest form of
+`python bench/bench.py parity`). Skipped unless TEST_DATABASE_URL is set.
+"""
+import io
+from urllib.parse import quote
+
+import pytest
+
+from conftest import POSTGRES_URL, database_urls, make_test_app
+
+PNG_1X1 = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01"
+    b"\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\x0bIDATx\x9cc``\x00\x00\x00\x02"
+    b"\x00\x01\xe2!\xbc3\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="set TEST_DATABASE_URL to compare against PostgreSQL")
+def test_sqlite_and_postgres_return_the_same_json(tmp_path):
+    import app as appmod
+    import datagen
+    from extensions import db
+
+    clients = {}
+    for name, url in database_urls(tmp_path).items():
+        (tmp_path / name).mkdir()
+        app = make_test_app(url, tmp_path / name, RESPONSE_CACHE_ENABLED=False)
+        with app.app_context():
+            appmod.init_db()
+            datagen.generate(users=200, records=2000, seed=7, upload_folder=str(tmp_path / name / "uploads"))
+            db.session.remove()
+        clients[name] = app.test_client()
+
+    row = clients["sqlite"].get("/api/current-wrs").get_json()[0]
+    course = row["course_key"]
+    reads = [
+        "/api/current-wrs", "/api/wr-snapshot", "/api/recent-wrs?days=30", "/api/recent-wrs?days=365",
+        "/api/rankings/players", "/api/rankings/countries", "/api/countries", "/api/bootstrap?days=365",
+        f"/api/course/{course}", f"/api/course/{course}/history?limit=200",
+        f"/api/course/{course}/leaderboard?machine={quote(row['machine_name'])}&limit=100",
+        f"/api/players/{quote(row['player'])}",
+    ]
+
+    def check(step):
+        for path in reads:
+            bodies = {name: c.get(path).get_json() for name, c in clients.items()}
+            assert bodies["sqlite"] == bodies["postgresql"], f"{path} differs after {step}"
+
+    check("load")
+
+    tokens = {}
+    for name, c in clients.items():
+        resp = c.post("/api/register", json={"username": "parity_user", "password": "parity-pass", "country_code": "jp"})
+        tokens[name] = resp.get_json()["access_token"]
+        resp = c.post(
+            "/api/records", headers={"Authorization": f"Bearer {tokens[name]}"},
+            data={
+                "course_key": course, "machine_name": row["machine_name"], "character_name": row["character_name"],
+                "time": "0'00\"001", "proof": (io.BytesIO(PNG_1X1), "parity.png"),
+            },
+            content_type="multipart/form-data",
+        )
+        assert resp.get_json()["is_wr"]
+    check("new WR")
+
+    for name, c in clients.items():
+        c.delete("/api/me", headers={"Authorization": f"Bearer {tokens[name]}"})
+    check("account delete")
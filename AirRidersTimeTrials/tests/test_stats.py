@@ -0,0 +1,4 @@
+def test_recent_wrs_days_out_of_range(app):
+    client = app.test_client()
+    for path in ("/api/recent-wrs?days=99999999999", "/api/recent-wrs?days=-5", "/api/bootstrap?days=99999999999"):
+        assert client.get(path).status_code == 200, path
@@ -0,0 +1,95 @@
+"""The incremental WR tables (wr_index.py) have to end up exactly where a full rebuild would."""
+from datetime import date
+
+from extensions import db
+from models import Course, Machine, Character, User, Record, CurrentWR, WrReign, PersonalBest
+from cache import bump_data_version
+import wr_index
+
+
+def _snapshot():
+    return {
+        "current_wrs": sorted(
+            (r.course_id, r.machine_id, r.record_id, r.user_id, r.time_ms, r.date_set) for r in CurrentWR.query
+        ),
+        "wr_reigns": sorted(
+            (r.course_id, r.machine_id, r.user_id, r.record_id, r.time_ms, r.start_date, r.end_date or date.max)
+            for r in WrReign.query
+        ),
+        "personal_bests": sorted(
+            (r.user_id, r.course_id, r.machine_id, r.record_id, r.time_ms, r.date_set) for r in PersonalBest.query
+        ),
+    }
+
+
+def _assert_matches_rebuild():
+    incremental = _snapshot()
+    wr_index.rebuild_current_wrs()
+    wr_index.rebuild_wr_reigns()
+    wr_index.rebuild_personal_bests()
+    assert incremental == _snapshot()
+
+
+class World:
+    def __init__(self):
+        self.course = Course(course_key="floria-fields", name="Floria Fields")
+        self.machines = [
+            Machine(name="Warp Star", icon="images/machineICONS/warp.png"),
+            Machine(name="Wagon Star", icon="images/machineICONS/wagon.png"),
+        ]
+        self.character = Character(name="Kirby", icon="images/charICONS/kirby.png")
+        self.users = {name: User(username=name, password_hash="x") for name in ("ann", "bob", "cat")}
+        db.session.add_all([self.course, self.character, *self.machines, *self.users.values()])
+        db.session.commit()
+
+    def submit(self, username, machine, time_ms, day):
+        """What create_record does, with a chosen date."""
+        rec = Record(
+            course_id=self.course.id, machine_id=self.machines[machine].id, character_id=self.character.id,
+            user_id=self.users[username].id, time_str=str(time_ms), time_ms=time_ms,
+            date_set=date(2025, 1, day), proof_url="/uploads/proof.png",
+        )
+        db.session.add(rec)
+        db.session.flush()
+        is_wr = wr_index.on_record_created(rec)
+        bump_data_version()
+        db.session.commit()
+        return is_wr
+
+    def delete_user(self, username):
+        """What delete_me does."""
+        user = self.users.pop(username)
+        pairs = wr_index.forget_user(user.id)
+        db.session.delete(user)
+        db.session.flush()
+        wr_index.recompute_pairs(pairs)
+        bump_data_version()
+        db.session.commit()
+
+
+def test_inserts_ties_improvements_and_deletes_match_a_rebuild(app):
+    w = World()
+
+    assert w.submit("ann", 0, 60_000, 1)        # first WR
+    assert not w.submit("bob", 0, 60_000, 2)    # tie: the earlier record keeps it
+    assert w.submit("cat", 0, 59_000, 3)        # improvement
+    assert w.submit("ann", 0, 58_000, 4)        # ann back on top, her PB improves
+    assert not w.submit("bob", 0, 58_000, 4)    # same-day tie: the earlier submission keeps it
+    assert not w.submit("ann", 0, 61_000, 5)    # slower than her PB: nothing changes
+
+    assert w.submit("bob", 1, 70_000, 1)
+    assert not w.submit("ann", 1, 70_000, 1)
+    assert w.submit("cat", 1, 69_000, 2)
+    _assert_matches_rebuild()
+
+    w.delete_user("ann")                        # current WR holder on machine 0
+    _assert_matches_rebuild()
+    assert CurrentWR.query.filter_by(machine_id=w.machines[0].id).one().user_id == w.users["bob"].id
+
+    w.delete_user("cat")                        # current WR holder on machine 1, past holder on machine 0
+    _assert_matches_rebuild()
+
+    assert not w.submit("bob", 1, 71_000, 6)    # bob is the only one left; his 70_000 still stands
+    w.delete_user("bob")
+    _assert_matches_rebuild()
+    assert CurrentWR.query.count() == 0